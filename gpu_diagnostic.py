@@ -7,7 +7,6 @@ Checks dependencies, GPU availability, and FFmpeg functionality
 import os
 import subprocess
 import sys
-import traceback
 from pathlib import Path
 
 print("========== GPU WORKER DIAGNOSTIC TOOL ==========")
@@ -132,6 +131,8 @@ try:
     else:
         print("❌ Failed to write test clip - file not created")
 except Exception as e:
+    import traceback
+
     print(f"❌ FFmpeg test failed: {e}")
     print(traceback.format_exc())
 
@@ -4,28 +4,15 @@ from datetime import datetime
 
 import requests
 from dotenv import load_dotenv
-from openai import OpenAI
 
-load_dotenv()
-timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-
-# Global client variable for lazy initialization
-client = None
+from story_generator import get_openai_client
 
+load_dotenv()
 
-def get_openai_client():
-    """Get or initialize the OpenAI client."""
-    global client
-    if client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-        client = OpenAI(
-            api_key=api_key,
-            organization=os.getenv("OPENAI_ORG_ID"),
-            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-        )
-    return client
+# Image generation is much slower than the shared client's 60s read timeout,
+# so it gets the OpenAI SDK's default of 10 minutes
+IMAGE_GENERATION_TIMEOUT = 600
+timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
 
 
 def search_pexels_image(query, output_path):
@@ -128,7 +115,9 @@ def generate_image(prompt, output_path):
 
         # Make the API call
         logging.info(f"Making OpenAI API call for prompt: {prompt[:100]}...")
-        response = client.images.generate(prompt=prompt, n=1, size="1024x1024")
+        response = client.images.generate(
+            prompt=prompt, n=1, size="1024x1024", timeout=IMAGE_GENERATION_TIMEOUT
+        )
 
         logging.info(f"OpenAI API response type: {type(response)}")
         logging.info(f"OpenAI API response: {response}")
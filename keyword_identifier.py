@@ -1,24 +1,4 @@
 import logging
-import os
-
-from openai import OpenAI
-
-# Global client variable for lazy initialization
-client = None
-
-
-def get_openai_client():
-    """Get or initialize the OpenAI client."""
-    global client
-    if client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-        )
-    return client
 
 
 def extract_image_prompts(story, num_prompts=5):
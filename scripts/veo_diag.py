@@ -11,35 +11,35 @@ It verifies:
 5. Zero-token API call functionality
 
 Usage:
-    python scripts/veo_diag.py [--verbose]
+    python scripts/veo_diag.py [--verbose] [--checks auth deps storage api]
+                               [--no-cache | --force] [--cache-ttl SECONDS]
+                               [--deep-storage-check] [--paranoid] [--json]
 """
 
 import argparse
+import functools
+import glob
+import hashlib
+import importlib
+import importlib.util
 import json
 import logging
 import os
+import site
+import socket
+import subprocess
 import sys
+import sysconfig
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from importlib.metadata import PackageNotFoundError, version
+from types import ModuleType
 from typing import Any, Dict
 
-# Fix Python path to ensure modules can be found
-# Add the current directory to the Python path
-sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
-
-# Add virtual environment site-packages to Python path
-venv_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "venv")
-if os.path.exists(venv_dir):
-    site_packages = os.path.join(
-        venv_dir,
-        "lib",
-        f"python{sys.version_info.major}.{sys.version_info.minor}",
-        "site-packages",
-    )
-    if os.path.exists(site_packages):
-        sys.path.insert(0, site_packages)
-        print(f"Added virtual environment site-packages: {site_packages}")
-
-# Configure logging
+# Configure logging. Records go to stderr, keeping stdout free for --json
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -47,21 +47,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger("veo-diag")
 
-# Results dictionary
-results = {
-    "import_checks": {"status": "not_run", "details": {}},
-    "auth_checks": {"status": "not_run", "details": {}},
-    "dependency_checks": {"status": "not_run", "details": {}},
-    "api_checks": {"status": "not_run", "details": {}},
-    "storage_checks": {"status": "not_run", "details": {}},
-    "overall": {"status": "not_run", "summary": "Diagnostics not yet run"},
-}
+# Fix Python path to ensure modules can be found
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+# Add virtual environment site-packages to Python path, unless the
+# interpreter is already running from that venv or has it on sys.path
+venv_dir = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "venv")
+)
+site_packages = os.path.join(
+    venv_dir,
+    "lib",
+    f"python{sys.version_info.major}.{sys.version_info.minor}",
+    "site-packages",
+)
+if (
+    os.path.realpath(sys.prefix) != os.path.realpath(venv_dir)
+    and site_packages not in sys.path
+    and os.path.isdir(site_packages)
+):
+    sys.path.insert(0, site_packages)
+    importlib.invalidate_caches()
+    logger.info(f"Added virtual environment site-packages: {site_packages}")
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+@dataclass
+class CheckResult:
+    """Status and details recorded by a single diagnostic check.
+
+    flags holds machine-readable findings (e.g. python_version_unsupported)
+    that the recommendations are derived from.
+    """
+
+    status: str = "not_run"
+    details: Dict[str, Any] = field(default_factory=dict)
+    flags: Dict[str, bool] = field(default_factory=dict)
+
+
+@dataclass
+class DiagResults:
+    """Results of one run_diagnostics() call, one CheckResult per category."""
+
+    import_checks: CheckResult = field(default_factory=CheckResult)
+    auth_checks: CheckResult = field(default_factory=CheckResult)
+    dependency_checks: CheckResult = field(default_factory=CheckResult)
+    api_checks: CheckResult = field(default_factory=CheckResult)
+    storage_checks: CheckResult = field(default_factory=CheckResult)
+    overall: Dict[str, Any] = field(
+        default_factory=lambda: {
+            "status": "not_run",
+            "summary": "Diagnostics not yet run",
+        }
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the results as plain dicts for JSON serialization."""
+        return asdict(self)
+
+
+# Modules imported on first use by _imported(), shared by the checks
+_IMPORTED: Dict[str, ModuleType] = {}
+
+# Where import/dependency check results are cached between runs
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "veo-diag")
+
+# GenerativeModel.generate_video_async availability by SDK version
+_VIDEO_ASYNC_SUPPORT: Dict[str, bool] = {}
 
+# Serializes the first _get_storage_client() call across the check threads
+_STORAGE_CLIENT_LOCK = threading.Lock()
 
-def check_imports() -> bool:
-    """Check if required packages are installed and can be imported."""
+# Interpreter version, checked against the version Veo SDK supports
+PY_VERSION = sys.version_info
+
+# Link-local address of the GCE metadata server
+METADATA_SERVER_HOST = "169.254.169.254"
+
+# Object permissions the Veo jobs need on the output bucket
+STORAGE_PERMISSIONS = [
+    "storage.objects.create",
+    "storage.objects.get",
+    "storage.objects.delete",
+]
+
+# Distributions providing the required imports; their presence is part of
+# the import cache key
+REQUIRED_DISTRIBUTIONS = ("google-cloud-aiplatform", "google-cloud-storage")
+
+# Checks that can be selected with --checks (imports always run first)
+AVAILABLE_CHECKS = ("auth", "deps", "storage", "api")
+
+
+def check_imports(r: DiagResults) -> bool:
+    """Check if required packages are installed and can be imported.
+
+    Modules are located with find_spec() rather than imported; the checks
+    that need them import them on first use through _imported(). Locating a
+    dotted name still imports its parent packages (e.g. vertexai for
+    vertexai.preview), so errors raised by those are reported here too.
+    """
     logger.info("Checking imports...")
-    results["import_checks"]["status"] = "running"
+    r.import_checks.status = "running"
 
     # Required imports
     required_imports = [
@@ -74,80 +168,307 @@ def check_imports() -> bool:
     success = True
     for module_name in required_imports:
         try:
-            __import__(module_name)
-            results["import_checks"]["details"][module_name] = "available"
+            if importlib.util.find_spec(module_name) is None:
+                raise ModuleNotFoundError(f"No module named '{module_name}'")
+            r.import_checks.details[module_name] = "available"
             logger.info(f"✓ {module_name} available")
-        except ImportError as e:
-            results["import_checks"]["details"][module_name] = str(e)
+        except Exception as e:
+            # A parent package can fail with any error while it is imported
+            r.import_checks.details[module_name] = str(e)
             logger.error(f"✗ {module_name} import error: {e}")
             success = False
 
-    results["import_checks"]["status"] = "success" if success else "failure"
+    r.import_checks.status = "success" if success else "failure"
     return success
 
 
-def check_authentication() -> bool:
+def _imported(module_name: str) -> ModuleType:
+    """Return a module checked by check_imports(), importing it on first use."""
+    if module_name not in _IMPORTED:
+        _IMPORTED[module_name] = importlib.import_module(module_name)
+    return _IMPORTED[module_name]
+
+
+def _import_cache_path() -> str:
+    """Return the cache file for the current interpreter and installed packages.
+
+    The key changes whenever a distribution is installed or upgraded, since
+    that rewrites its dist-info METADATA file, when one of the Veo
+    distributions is uninstalled, or when sys.path changes (e.g. a different
+    PYTHONPATH).
+    """
+    site_dirs = set(site.getsitepackages() + [sysconfig.get_paths()["purelib"]])
+    metadata_paths = [
+        path
+        for site_dir in site_dirs
+        for path in glob.glob(os.path.join(site_dir, "*.dist-info", "METADATA"))
+    ]
+    mtimes = [os.path.getmtime(path) for path in metadata_paths]
+    # dist-info directories are named <normalized_name>-<version>.dist-info
+    installed = {
+        os.path.basename(os.path.dirname(path)).split("-")[0].lower()
+        for path in metadata_paths
+    }
+    dist_status = [
+        f"{dist}={'found' if dist.replace('-', '_') in installed else 'missing'}"
+        for dist in REQUIRED_DISTRIBUTIONS
+    ]
+    key_source = "|".join(
+        [sys.prefix, sys.version, str(max(mtimes, default=0))] + dist_status + sys.path
+    )
+    key = hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _load_import_cache() -> Dict[str, Any]:
+    """Return cached import/dependency check results, or {} on a miss."""
+    try:
+        with open(_import_cache_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _dumps(obj: Dict[str, Any], compact: bool = False) -> bytes:
+    """Serialize results to UTF-8 JSON, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        option = 0 if compact else orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if compact:
+        return json.dumps(obj, separators=(",", ":")).encode()
+    return json.dumps(obj, indent=2).encode()
+
+
+def _write_cache_file(path: str, data: Dict[str, Any]) -> None:
+    """Atomically write data as JSON to a file in the cache directory."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_dumps(data, compact=True))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"Could not write cache file {path}: {e}")
+
+
+def _save_import_cache(r: DiagResults) -> None:
+    """Persist successful import/dependency check results for later runs."""
+    cached = {"import_checks": asdict(r.import_checks)}
+    if r.dependency_checks.status != "not_run":
+        cached["dependency_checks"] = asdict(r.dependency_checks)
+    _write_cache_file(_import_cache_path(), cached)
+
+
+def _results_cache_path(checks, deep_storage: bool, paranoid: bool) -> str:
+    """Return the cache file for a full run with the current configuration.
+
+    The key covers everything the checks depend on: project, bucket and
+    model settings, the credentials file and when it last changed, the
+    installed packages (via the import cache key) and the run options.
+    """
+    creds_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "")
+    try:
+        creds_mtime = os.path.getmtime(creds_file) if creds_file else 0
+    except OSError:
+        creds_mtime = 0
+    key_source = json.dumps(
+        {
+            "project": os.environ.get("GOOGLE_CLOUD_PROJECT")
+            or os.environ.get("GCLOUD_PROJECT"),
+            "bucket": os.environ.get("VERTEX_BUCKET_NAME"),
+            "model": os.environ.get("VEO_MODEL"),
+            "credentials_file": creds_file,
+            "credentials_mtime": creds_mtime,
+            "packages": os.path.basename(_import_cache_path()),
+            "checks": sorted(checks),
+            "deep_storage": deep_storage,
+            "paranoid": paranoid,
+        },
+        sort_keys=True,
+    )
+    key = hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"results-{key}.json")
+
+
+def _load_results_cache(path: str, ttl: float) -> Dict[str, Any]:
+    """Return cached results if the file is younger than ttl seconds, else {}."""
+    try:
+        age = time.time() - os.path.getmtime(path)
+        if age >= ttl:
+            return {}
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    logger.info(f"Using cached diagnostic results from {age:.0f}s ago")
+    return results
+
+
+@functools.lru_cache(maxsize=1)
+def _aiplatform_version() -> str:
+    """Return the installed google-cloud-aiplatform version.
+
+    Read from the distribution metadata so the package itself doesn't have
+    to be imported.
+    """
+    try:
+        return version("google-cloud-aiplatform")
+    except PackageNotFoundError:
+        return _imported("google.cloud.aiplatform").__version__
+
+
+def _supports_generate_video_async(model_cls) -> bool:
+    """Return whether this SDK version's GenerativeModel has generate_video_async.
+
+    The answer only depends on the installed SDK, so it is looked up on the
+    class once per version instead of probing each model instance.
+    """
+    sdk_version = _aiplatform_version()
+    if sdk_version not in _VIDEO_ASYNC_SUPPORT:
+        _VIDEO_ASYNC_SUPPORT[sdk_version] = hasattr(model_cls, "generate_video_async")
+    return _VIDEO_ASYNC_SUPPORT[sdk_version]
+
+
+def _on_gce() -> bool:
+    """Return True if the GCE metadata server answers within 100 ms."""
+    try:
+        with socket.create_connection((METADATA_SERVER_HOST, 80), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def _gcloud_project() -> str:
+    """Return the project from the active gcloud configuration, or ""."""
+    try:
+        result = subprocess.run(
+            ["gcloud", "config", "get-value", "project"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+
+def _resolve_project():
+    """Work out which project the storage client should use.
+
+    Returns a (project_id, source) tuple. project_id is None when
+    google-auth can find it cheaply by itself, i.e. from a service account
+    key file or, on GCE, from the metadata server. Off GCE without either,
+    the gcloud configuration is used so google-auth never waits on the
+    unreachable metadata server.
+
+    Raises:
+        RuntimeError: If no project can be determined outside GCE.
+    """
+    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT") or os.environ.get(
+        "GCLOUD_PROJECT"
+    )
+    if project_id:
+        return project_id, "env"
+    if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
+        return None, "adc"
+    if _on_gce():
+        return None, "metadata_server"
+    project_id = _gcloud_project()
+    if project_id:
+        return project_id, "gcloud"
+    raise RuntimeError(
+        "No Google Cloud project configured and not running on GCE. "
+        "Set GOOGLE_CLOUD_PROJECT or run 'gcloud config set project <id>'"
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _build_storage_client():
+    """Create the storage client and return it with its project source.
+
+    The project is passed explicitly whenever it is known up front, which
+    keeps google-auth from falling back to the GCE metadata server and
+    blocking for several seconds on machines outside GCP.
+    """
+    storage = _imported("google.cloud.storage")
+    project_id, source = _resolve_project()
+    return storage.Client(project=project_id), source
+
+
+def _get_storage_client():
+    """Return the shared storage client and how its project was resolved."""
+    # The auth and storage checks run concurrently and both need the client;
+    # the lock keeps them from both filling the cache slot
+    with _STORAGE_CLIENT_LOCK:
+        return _build_storage_client()
+
+
+def check_authentication(r: DiagResults) -> bool:
     """Check if Google Cloud authentication is properly configured."""
     logger.info("Checking authentication...")
-    results["auth_checks"]["status"] = "running"
+    r.auth_checks.status = "running"
 
     # Verify credentials are available
     creds_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    results["auth_checks"]["details"]["credentials_file"] = creds_file or "Not set"
+    r.auth_checks.details["credentials_file"] = creds_file or "Not set"
 
     if not creds_file:
         logger.warning("GOOGLE_APPLICATION_CREDENTIALS environment variable not set")
-        results["auth_checks"]["status"] = "warning"
-        results["auth_checks"]["details"]["warning"] = "No credentials file specified"
+        r.auth_checks.flags["creds_file_missing"] = True
+        r.auth_checks.status = "warning"
+        r.auth_checks.details["warning"] = "No credentials file specified"
         # Continue even without credentials - for diagnostic purposes only
         return True
     elif not os.path.exists(creds_file):
         logger.error(f"Credentials file {creds_file} does not exist")
-        results["auth_checks"]["status"] = "warning"
-        results["auth_checks"]["details"][
-            "warning"
-        ] = f"Credentials file {creds_file} not found"
+        r.auth_checks.flags["creds_file_missing"] = True
+        r.auth_checks.status = "warning"
+        r.auth_checks.details["warning"] = f"Credentials file {creds_file} not found"
         # Continue even without credentials - for diagnostic purposes only
         return True
 
     # Try to initialize the storage client to verify credentials
     try:
-        from google.cloud import storage
-
-        client = storage.Client()
+        client, project_source = _get_storage_client()
         project_id = client.project
-        results["auth_checks"]["details"]["project_id"] = project_id
+        r.auth_checks.details["project_id"] = project_id
+        r.auth_checks.details["project_source"] = project_source
         logger.info(f"✓ Authenticated to project: {project_id}")
-        results["auth_checks"]["status"] = "success"
+        r.auth_checks.status = "success"
         return True
     except Exception as e:
         logger.error(f"✗ Authentication error: {e}")
-        results["auth_checks"]["details"]["error"] = str(e)
-        results["auth_checks"]["status"] = "warning"
+        r.auth_checks.details["error"] = str(e)
+        r.auth_checks.flags["auth_error"] = True
+        r.auth_checks.status = "warning"
         # Continue even without credentials - for diagnostic purposes only
         return True
 
 
-def check_dependencies() -> bool:
+def check_dependencies(r: DiagResults) -> bool:
     """Check if the necessary Veo dependencies have the correct versions."""
     logger.info("Checking dependencies...")
-    results["dependency_checks"]["status"] = "running"
+    r.dependency_checks.status = "running"
 
     dependency_info = {}
     all_ok = True
 
     try:
-        import google.cloud.aiplatform as aip
-
-        dependency_info["google-cloud-aiplatform"] = aip.__version__
-        logger.info(f"✓ google-cloud-aiplatform: {aip.__version__}")
-
-        # Check if [preview] is installed
+        # vertexai ships in the same distribution as google-cloud-aiplatform
+        aip_version = _aiplatform_version()
+        dependency_info["google-cloud-aiplatform"] = aip_version
+        dependency_info["vertexai"] = aip_version
+        logger.info(f"✓ google-cloud-aiplatform: {aip_version}")
+
+        # Check if [preview] is installed. find_spec locates the modules
+        # without executing them, so the gRPC/protobuf stubs aren't loaded
         try:
-            import vertexai.preview
-
+            if importlib.util.find_spec("vertexai.preview") is None:
+                raise ModuleNotFoundError("No module named 'vertexai.preview'")
             dependency_info["vertexai.preview"] = "available"
-            logger.info(f"✓ vertexai.preview: available")
+            logger.info("✓ vertexai.preview: available")
         except ImportError:
             dependency_info["vertexai.preview"] = "missing"
             logger.error(
@@ -157,20 +478,21 @@ def check_dependencies() -> bool:
 
         # Check generative models
         try:
-            from vertexai.preview.generative_models import GenerativeModel
-
+            if importlib.util.find_spec("vertexai.preview.generative_models") is None:
+                raise ModuleNotFoundError(
+                    "No module named 'vertexai.preview.generative_models'"
+                )
             dependency_info["generative_models"] = "available"
-            logger.info(f"✓ vertexai.preview.generative_models: available")
+            logger.info("✓ vertexai.preview.generative_models: available")
         except ImportError as e:
             dependency_info["generative_models"] = str(e)
             logger.error(f"✗ generative_models import error: {e}")
             all_ok = False
 
         # Check Python version
-        import sys
-
-        py_version = sys.version_info
+        py_version = PY_VERSION
         if py_version.major == 3 and py_version.minor > 11:
+            r.dependency_checks.flags["python_version_unsupported"] = True
             dependency_info["python_version"] = (
                 f"{py_version.major}.{py_version.minor}.{py_version.micro} (not recommended)"
             )
@@ -190,22 +512,49 @@ def check_dependencies() -> bool:
         dependency_info["error"] = str(e)
         all_ok = False
 
-    results["dependency_checks"]["details"] = dependency_info
-    results["dependency_checks"]["status"] = "success" if all_ok else "failure"
+    r.dependency_checks.details = dependency_info
+    r.dependency_checks.status = "success" if all_ok else "failure"
     return all_ok
 
 
-def check_api_connection() -> bool:
-    """Check if Veo API is accessible by doing a zero-token probe call."""
-    logger.info("Checking API connection...")
-    results["api_checks"]["status"] = "running"
+@functools.lru_cache(maxsize=1)
+def _video_probe_config():
+    """Return the GenerationConfig for the zero-token video probe.
+
+    Built once and reused, since GenerationConfig validates every field on
+    construction.
+    """
+    GenerationConfig = _imported("vertexai.preview.generative_models").GenerationConfig
+    return GenerationConfig(
+        duration_seconds=5,
+        aspect_ratio="16:9",
+        sample_count=1,  # Required parameter
+        return_raw_tokens=True,  # Zero-token probe
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _text_probe_config():
+    """Return the GenerationConfig for the generate_content fallback."""
+    GenerationConfig = _imported("vertexai.preview.generative_models").GenerationConfig
+    return GenerationConfig(
+        temperature=0.1,
+        top_p=0.8,
+        top_k=40,
+        candidate_count=1,
+    )
 
+
+def _probe_api_connection(api: CheckResult) -> bool:
+    """Run the zero-token Veo API probe, recording the outcome in api."""
     try:
-        from vertexai.preview.generative_models import GenerationConfig, GenerativeModel
+        GenerativeModel = _imported(
+            "vertexai.preview.generative_models"
+        ).GenerativeModel
 
         # Get the model ID from environment or use default
         model_id = os.environ.get("VEO_MODEL", "veo-3.0-generate-preview")
-        results["api_checks"]["details"]["model_id"] = model_id
+        api.details["model_id"] = model_id
 
         # Initialize the model
         logger.info(f"Initializing model {model_id}...")
@@ -227,43 +576,34 @@ def check_api_connection() -> bool:
         # Try to use the model's generate_video_async method
         try:
             # First check if the method exists
-            if not hasattr(model, "generate_video_async"):
-                results["api_checks"]["details"]["generate_video_async"] = {
+            if not _supports_generate_video_async(GenerativeModel):
+                api.flags["sdk_missing_generate_video_async"] = True
+                api.details["generate_video_async"] = {
                     "status": "warning",
                     "message": "Method not available in this version of Veo SDK",
                 }
                 logger.error(
-                    f"✗ generate_video_async error: 'GenerativeModel' object has no attribute 'generate_video_async'"
+                    "✗ generate_video_async error: 'GenerativeModel' object has no attribute 'generate_video_async'"
                 )
 
                 # Use regular generate method instead for diagnostic purposes
                 response = model.generate_content(
                     prompt,
-                    generation_config=GenerationConfig(
-                        temperature=0.1,
-                        top_p=0.8,
-                        top_k=40,
-                        candidate_count=1,
-                    ),
+                    generation_config=_text_probe_config(),
                 )
 
-                results["api_checks"]["details"]["generate_content"] = {
+                api.details["generate_content"] = {
                     "status": "success",
                     "message": "Generated content successfully as fallback",
                 }
                 logger.info("✓ generate_content fallback succeeded")
-                results["api_checks"]["status"] = "warning"
+                api.status = "warning"
                 return True
             else:
                 # Try to initiate the async call but don't wait for result
                 operation = model.generate_video_async(
                     prompt=prompt,
-                    generation_config=GenerationConfig(
-                        duration_seconds=5,
-                        aspect_ratio="16:9",
-                        sample_count=1,  # Required parameter
-                        return_raw_tokens=True,  # Zero-token probe
-                    ),
+                    generation_config=_video_probe_config(),
                     output_storage=f"gs://{bucket}/veo-diag/",
                 )
 
@@ -272,32 +612,32 @@ def check_api_connection() -> bool:
                     logger.info(
                         f"✓ Successfully initiated LRO: {operation.operation.name}"
                     )
-                    results["api_checks"]["details"]["generate_video_async"] = {
+                    api.details["generate_video_async"] = {
                         "status": "success",
                         "operation_name": operation.operation.name,
                     }
                 else:
                     logger.error("✗ Operation created but no operation ID returned")
-                    results["api_checks"]["details"]["generate_video_async"] = {
+                    api.details["generate_video_async"] = {
                         "status": "warning",
                         "error": "No operation ID returned",
                     }
         except Exception as e:
             logger.error(f"✗ Video generation API error: {e}")
-            results["api_checks"]["details"]["api_error"] = str(e)
+            api.details["api_error"] = str(e)
 
             # Try to at least check if the model works for text generation
             try:
                 response = model.generate_content(prompt)
-                results["api_checks"]["details"]["generate_content"] = {
+                api.details["generate_content"] = {
                     "status": "success",
                     "message": "Generated content successfully as fallback",
                 }
                 logger.info("✓ generate_content fallback succeeded")
-                results["api_checks"]["status"] = "warning"
+                api.status = "warning"
                 return True
             except Exception as text_e:
-                results["api_checks"]["details"]["generate_content"] = {
+                api.details["generate_content"] = {
                     "status": "failure",
                     "error": str(text_e),
                 }
@@ -305,23 +645,109 @@ def check_api_connection() -> bool:
 
         # Record timing
         elapsed = time.time() - start_time
-        results["api_checks"]["details"]["api_latency_sec"] = round(elapsed, 2)
+        api.details["api_latency_sec"] = round(elapsed, 2)
         logger.info(f"API call completed in {elapsed:.2f}s")
 
-        results["api_checks"]["status"] = "success"
+        api.status = "success"
         return True
 
     except Exception as e:
         logger.error(f"✗ API check error: {e}")
-        results["api_checks"]["details"]["error"] = str(e)
-        results["api_checks"]["status"] = "failure"
+        api.details["error"] = str(e)
+        if "Unable to find your project" in str(e):
+            api.flags["project_not_found"] = True
+        api.status = "failure"
+        return False
+
+
+def check_api_connection(r: DiagResults) -> bool:
+    """Check if Veo API is accessible by doing a zero-token probe call.
+
+    Model construction and the probe call can block on Vertex endpoint
+    discovery, so the probe runs in a daemon thread and is abandoned after
+    VEO_DIAG_TIMEOUT seconds (default 5). Being a daemon, an abandoned
+    probe doesn't keep the process alive at exit. The SDK is imported
+    before the deadline starts, since that alone can take several seconds
+    on a cold machine.
+    """
+    logger.info("Checking API connection...")
+    r.api_checks.status = "running"
+
+    try:
+        _imported("vertexai.preview.generative_models")
+    except Exception as e:
+        logger.error(f"✗ API check error: {e}")
+        r.api_checks.details["error"] = str(e)
+        r.api_checks.status = "failure"
         return False
 
+    # The probe records into its own CheckResult so that a timed-out call
+    # finishing late cannot overwrite the reported status
+    api = CheckResult(status="running")
+    timeout = float(os.environ.get("VEO_DIAG_TIMEOUT", "5"))
+    outcome = []
+    probe = threading.Thread(
+        target=lambda: outcome.append(_probe_api_connection(api)),
+        name="veo-diag-api-probe",
+        daemon=True,
+    )
+    probe.start()
+    probe.join(timeout)
+    if probe.is_alive() or not outcome:
+        logger.error(f"✗ API probe timed out after {timeout:.1f}s")
+        r.api_checks.details["error"] = f"API probe timed out after {timeout:.1f}s"
+        r.api_checks.status = "timeout"
+        return False
+
+    r.api_checks = api
+    return outcome[0]
+
 
-def check_storage_access() -> bool:
-    """Check if the GCS bucket for Veo output is accessible."""
+def _probe_storage_objects(r: DiagResults, bucket, bucket_name: str) -> None:
+    """Write, read back and delete a test object to prove effective access.
+
+    The object name is unique per run and every call is pinned to the
+    generation created by the upload, so concurrent runs never clobber or
+    delete each other's objects (or a real object at the same path).
+    """
+    # Try to write a test file
+    blob = bucket.blob(f"veo-diag/test-file-{uuid.uuid4().hex}.txt")
+    blob.upload_from_string(
+        f"Veo diagnostic test at {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        if_generation_match=0,
+    )
+    generation = blob.generation
+    r.storage_checks.details["write_access"] = True
+    logger.info(f"✓ Successfully wrote to bucket {bucket_name}")
+
+    # Read back the object metadata instead of downloading the content
+    blob.reload(if_generation_match=generation)
+    r.storage_checks.details["read_access"] = True
+    r.storage_checks.details["test_object"] = {
+        "exists": True,
+        "size": blob.size,
+        "etag": blob.etag,
+        "generation": generation,
+    }
+    logger.info(f"✓ Successfully read from bucket {bucket_name}")
+
+    # Clean up
+    blob.delete(if_generation_match=generation)
+    logger.info(f"✓ Successfully cleaned up test file from {bucket_name}")
+
+
+def check_storage_access(
+    r: DiagResults, deep: bool = False, paranoid: bool = False
+) -> bool:
+    """Check if the GCS bucket for Veo output is accessible.
+
+    By default the caller's object permissions are checked with a single
+    test_iam_permissions() call. With deep=True a test object is written,
+    read back and deleted instead, for when IAM and effective access differ.
+    With paranoid=True the bucket's existence is checked first.
+    """
     logger.info("Checking storage access...")
-    results["storage_checks"]["status"] = "running"
+    r.storage_checks.status = "running"
 
     # Try to get bucket name from different sources
     bucket_name = os.environ.get("VERTEX_BUCKET_NAME")
@@ -330,180 +756,323 @@ def check_storage_access() -> bool:
         bucket_name = f"{project_id}-video-jobs"
         logger.info(f"VERTEX_BUCKET_NAME not set, using default: {bucket_name}")
 
-    results["storage_checks"]["details"]["bucket_name"] = bucket_name
+    r.storage_checks.details["bucket_name"] = bucket_name
 
     try:
-        from google.cloud import storage
+        client, _ = _get_storage_client()
 
-        client = storage.Client()
-
-        # Check if bucket exists
+        # A missing bucket surfaces as a 404 from the permission or object
+        # calls below, so the separate existence check is opt-in
         try:
-            bucket = client.get_bucket(bucket_name)
-            results["storage_checks"]["details"]["bucket_exists"] = True
-            logger.info(f"✓ Bucket {bucket_name} exists and is accessible")
-
-            # Try to write a test file
-            blob = bucket.blob("veo-diag/test-file.txt")
-            blob.upload_from_string(
-                f"Veo diagnostic test at {time.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            results["storage_checks"]["details"]["write_access"] = True
-            logger.info(f"✓ Successfully wrote to bucket {bucket_name}")
+            bucket = client.bucket(bucket_name)
+            if paranoid:
+                if not bucket.exists():
+                    from google.api_core.exceptions import NotFound
 
-            # Try to read the file back
-            content = blob.download_as_text()
-            results["storage_checks"]["details"]["read_access"] = True
-            logger.info(f"✓ Successfully read from bucket {bucket_name}")
+                    raise NotFound(f"Bucket {bucket_name} not found")
+                logger.info(f"✓ Bucket {bucket_name} exists and is accessible")
 
-            # Clean up
-            blob.delete()
-            logger.info(f"✓ Successfully cleaned up test file from {bucket_name}")
+            if deep:
+                _probe_storage_objects(r, bucket, bucket_name)
+            else:
+                granted = bucket.test_iam_permissions(STORAGE_PERMISSIONS)
+                r.storage_checks.details["permissions"] = granted
+                r.storage_checks.details["write_access"] = (
+                    "storage.objects.create" in granted
+                )
+                r.storage_checks.details["read_access"] = (
+                    "storage.objects.get" in granted
+                )
+                r.storage_checks.details["delete_access"] = (
+                    "storage.objects.delete" in granted
+                )
+                missing = [p for p in STORAGE_PERMISSIONS if p not in granted]
+                if missing:
+                    logger.error(
+                        f"✗ Missing permissions on bucket {bucket_name}: {missing}"
+                    )
+                    r.storage_checks.details["missing_permissions"] = missing
+                    r.storage_checks.status = "failure"
+                    return False
+                logger.info(f"✓ Object permissions granted on bucket {bucket_name}")
 
-            results["storage_checks"]["status"] = "success"
+            r.storage_checks.details["bucket_exists"] = True
+            r.storage_checks.status = "success"
             return True
 
         except Exception as e:
             # Try to create the bucket if it doesn't exist
             if "Not found" in str(e) or "404" in str(e):
                 logger.error(f"✗ Bucket access error: {e}")
-                results["storage_checks"]["details"]["bucket_error"] = str(e)
+                r.storage_checks.details["bucket_error"] = str(e)
+                r.storage_checks.details["bucket_exists"] = False
 
                 # Suggest creating the bucket
                 project_id = client.project
-                results["storage_checks"]["details"][
-                    "create_command"
-                ] = f"gsutil mb -p {project_id} -l us-central1 gs://{bucket_name}"
-                results["storage_checks"]["details"]["bucket_creation_needed"] = True
+                r.storage_checks.details["create_command"] = (
+                    f"gsutil mb -p {project_id} -l us-central1 gs://{bucket_name}"
+                )
+                r.storage_checks.details["bucket_creation_needed"] = True
+                r.storage_checks.flags["bucket_creation_needed"] = True
 
-                results["storage_checks"]["status"] = "failure"
+                r.storage_checks.status = "failure"
                 return False
             else:
                 logger.error(f"✗ Bucket access error: {e}")
-                results["storage_checks"]["details"]["bucket_error"] = str(e)
-                results["storage_checks"]["status"] = "failure"
+                r.storage_checks.details["bucket_error"] = str(e)
+                r.storage_checks.status = "failure"
                 return False
 
     except Exception as e:
         logger.error(f"✗ Storage client error: {e}")
-        results["storage_checks"]["details"]["client_error"] = str(e)
-        results["storage_checks"]["status"] = "failure"
+        r.storage_checks.details["client_error"] = str(e)
+        r.storage_checks.status = "failure"
         return False
 
 
-def run_diagnostics() -> Dict[str, Any]:
-    """Run all diagnostic checks and return results."""
+def run_diagnostics(
+    checks=AVAILABLE_CHECKS, use_cache=True, deep_storage=False, paranoid=False
+) -> Dict[str, Any]:
+    """Run the selected diagnostic checks and return results.
+
+    Args:
+        checks: Names from AVAILABLE_CHECKS to run. Checks that are not
+            selected keep the "not_run" status and don't affect the verdict.
+        use_cache: Reuse import/dependency results cached by an earlier run
+            against the same interpreter and installed packages.
+        deep_storage: Probe storage with a real write/read/delete instead
+            of only checking IAM permissions.
+        paranoid: Confirm the bucket exists with an extra request instead of
+            relying on the 404 from the storage probe.
+    """
     logger.info("Starting Veo SDK diagnostics...")
+    r = DiagResults()
+
+    cached = _load_import_cache() if use_cache else {}
+    deps_cached = "deps" in checks and "dependency_checks" in cached
+    if cached:
+        logger.info("Using cached import and dependency check results")
+        r.import_checks = CheckResult(**cached["import_checks"])
+    if deps_cached:
+        r.dependency_checks = CheckResult(**cached["dependency_checks"])
 
     # Run checks in sequence, stopping if a critical check fails
-    imports_ok = check_imports()
+    imports_ok = r.import_checks.status == "success" if cached else check_imports(r)
     if not imports_ok:
         logger.error("Import checks failed, cannot continue")
-        results["overall"]["status"] = "failure"
-        results["overall"]["summary"] = "Failed to import required modules"
-        return results
-
-    auth_ok = check_authentication()
-    # Continue even if auth fails - for diagnostic purposes
-
-    deps_ok = check_dependencies()
-    storage_ok = check_storage_access()
-    api_ok = check_api_connection()
+        r.overall["status"] = "failure"
+        r.overall["summary"] = "Failed to import required modules"
+        return r.to_dict()
+
+    # The remaining checks are independent and each writes to its own
+    # section of results, so they can run concurrently. Auth failures are
+    # reported but don't stop the other checks - for diagnostic purposes.
+    # The API probe is the slowest, so it is submitted first to overlap
+    # its model setup with everything else
+    check_funcs = {
+        "api": check_api_connection,
+        "auth": check_authentication,
+        "deps": check_dependencies,
+        "storage": functools.partial(
+            check_storage_access, deep=deep_storage, paranoid=paranoid
+        ),
+    }
+    check_ok = {name: True for name in check_funcs}
+    if deps_cached:
+        del check_funcs["deps"]
+        check_ok["deps"] = r.dependency_checks.status == "success"
+    selected = {name: func for name, func in check_funcs.items() if name in checks}
+    if selected:
+        with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+            futures = {
+                executor.submit(func, r): name for name, func in selected.items()
+            }
+            for future in as_completed(futures):
+                check_ok[futures[future]] = future.result()
+
+    if use_cache and (not cached or "deps" in selected):
+        _save_import_cache(r)
+
+    auth_ok = check_ok["auth"]
+    deps_ok = check_ok["deps"]
+    storage_ok = check_ok["storage"]
+    api_ok = check_ok["api"]
 
     # Determine overall status
     if imports_ok and deps_ok and storage_ok and api_ok:
-        results["overall"]["status"] = "success"
-        results["overall"]["summary"] = "All Veo SDK checks passed"
+        r.overall["status"] = "success"
+        r.overall["summary"] = "All Veo SDK checks passed"
     elif imports_ok and api_ok:
-        results["overall"]["status"] = "warning"
-        results["overall"][
-            "summary"
-        ] = "Core Veo SDK functionality works, but some checks failed"
+        r.overall["status"] = "warning"
+        r.overall["summary"] = (
+            "Core Veo SDK functionality works, but some checks failed"
+        )
     else:
-        results["overall"]["status"] = "failure"
-        results["overall"]["summary"] = "Veo SDK is not functioning correctly"
+        r.overall["status"] = "failure"
+        r.overall["summary"] = "Veo SDK is not functioning correctly"
 
     # Add recommended actions
-    results["overall"]["recommendations"] = []
+    r.overall["recommendations"] = []
 
     if not storage_ok:
-        if results["storage_checks"]["details"].get("bucket_creation_needed"):
-            cmd = results["storage_checks"]["details"].get("create_command", "")
-            results["overall"]["recommendations"].append(
-                f"Create a GCS bucket with: {cmd}"
-            )
+        if r.storage_checks.flags.get("bucket_creation_needed"):
+            cmd = r.storage_checks.details.get("create_command", "")
+            r.overall["recommendations"].append(f"Create a GCS bucket with: {cmd}")
         else:
-            results["overall"]["recommendations"].append(
+            r.overall["recommendations"].append(
                 "Set VERTEX_BUCKET_NAME environment variable and ensure the bucket exists"
             )
 
     if not api_ok:
-        api_details = results["api_checks"]["details"]
-        if "generate_video_async" in str(api_details.get("error", "")):
-            results["overall"]["recommendations"].append(
+        if r.api_checks.flags.get("sdk_missing_generate_video_async"):
+            r.overall["recommendations"].append(
                 "Update to a newer version of google-cloud-aiplatform[preview]"
             )
-        elif "Unable to find your project" in str(api_details.get("error", "")):
-            results["overall"]["recommendations"].append(
+        elif r.api_checks.flags.get("project_not_found"):
+            r.overall["recommendations"].append(
                 "Set GOOGLE_CLOUD_PROJECT environment variable"
             )
 
-    if auth_ok == False or results["auth_checks"]["status"] == "warning":
-        results["overall"]["recommendations"].append(
+    if (
+        not auth_ok
+        or r.auth_checks.flags.get("creds_file_missing")
+        or r.auth_checks.flags.get("auth_error")
+    ):
+        r.overall["recommendations"].append(
             "Set GOOGLE_APPLICATION_CREDENTIALS environment variable to your service account key"
         )
 
-    if (
-        "python_version" in results["dependency_checks"]["details"]
-        and "not recommended"
-        in results["dependency_checks"]["details"]["python_version"]
-    ):
-        results["overall"]["recommendations"].append(
+    if r.dependency_checks.flags.get("python_version_unsupported"):
+        r.overall["recommendations"].append(
             "Use Python 3.11 instead of current Python version for best compatibility"
         )
 
-    logger.info(f"Diagnostics complete: {results['overall']['summary']}")
-    return results
+    logger.info(f"Diagnostics complete: {r.overall['summary']}")
+    return r.to_dict()
+
+
+def _print_summary(results: Dict[str, Any]) -> None:
+    """Write the human-readable summary of results in a single write."""
+    lines = [
+        "\n===== Veo SDK Diagnostic Results =====",
+        f"Overall: {results['overall']['status'].upper()} - {results['overall']['summary']}",
+        "\nDetail by category:",
+    ]
+    lines.extend(
+        f"- {category}: {results[category]['status'].upper()}"
+        for category in [
+            "import_checks",
+            "auth_checks",
+            "dependency_checks",
+            "api_checks",
+            "storage_checks",
+        ]
+    )
+
+    recommendations = results["overall"].get("recommendations")
+    if recommendations:
+        lines.append("\nRecommended actions:")
+        lines.extend(f"- {rec}" for rec in recommendations)
+
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Veo SDK Diagnostic Tool")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--output", type=str, help="Save results to JSON file")
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON on stdout instead of the text summary",
+    )
+    parser.add_argument(
+        "--checks",
+        nargs="+",
+        choices=AVAILABLE_CHECKS,
+        default=list(AVAILABLE_CHECKS),
+        help="Checks to run after the import check (default: all)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write any cached results",
+    )
+    parser.add_argument(
+        "--deep-storage-check",
+        action="store_true",
+        help="Write, read and delete a test object instead of only checking IAM",
+    )
+    parser.add_argument(
+        "--paranoid",
+        action="store_true",
+        help="Check that the bucket exists before probing it (one extra request)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=("pretty", "compact"),
+        help="JSON layout for --output; compact emits a single line for log "
+        "ingestion (default: pretty on a terminal, compact otherwise)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=0,
+        help="Reuse successful results from a run with the same configuration "
+        "within this many seconds (default: 0, always run the checks)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore cached results and run every check again",
+    )
     args = parser.parse_args()
 
     # Set logging level based on verbosity
     if args.verbose:
         logger.setLevel(logging.DEBUG)
 
+    # Reuse a recent successful run with the same configuration if allowed
+    use_results_cache = not args.no_cache and args.cache_ttl > 0
+    results = {}
+    if use_results_cache:
+        cache_path = _results_cache_path(
+            args.checks, args.deep_storage_check, args.paranoid
+        )
+        if not args.force:
+            results = _load_results_cache(cache_path, args.cache_ttl)
+
     # Run diagnostics
-    results = run_diagnostics()
+    if not results:
+        results = run_diagnostics(
+            args.checks,
+            use_cache=not (args.no_cache or args.force),
+            deep_storage=args.deep_storage_check,
+            paranoid=args.paranoid,
+        )
+        # Only successes are cached, so a failing setup is re-checked every run
+        if use_results_cache and results["overall"]["status"] == "success":
+            _write_cache_file(cache_path, results)
 
-    # Print human-readable summary
-    print("\n===== Veo SDK Diagnostic Results =====")
-    print(
-        f"Overall: {results['overall']['status'].upper()} - {results['overall']['summary']}"
+    # Pretty-print for people at a terminal, one line for CI log ingestion
+    output_format = args.output_format or (
+        "pretty" if sys.stdout.isatty() else "compact"
     )
-    print("\nDetail by category:")
-    for category in [
-        "import_checks",
-        "auth_checks",
-        "dependency_checks",
-        "api_checks",
-        "storage_checks",
-    ]:
-        print(f"- {category}: {results[category]['status'].upper()}")
-
-    if results["overall"]["recommendations"]:
-        print("\nRecommended actions:")
-        for rec in results["overall"]["recommendations"]:
-            print(f"- {rec}")
+    compact = output_format == "compact"
+
+    # The log on stderr already reports each check as it runs, so in JSON
+    # mode the results are dumped as-is without building the summary
+    if args.json:
+        sys.stdout.buffer.write(_dumps(results, compact=compact) + b"\n")
+        sys.stdout.flush()
+    else:
+        _print_summary(results)
 
     # Save results to file if requested
     if args.output:
-        with open(args.output, "w") as f:
-            json.dump(results, f, indent=2)
-        print(f"\nDetailed results saved to {args.output}")
+        with open(args.output, "wb") as f:
+            f.write(_dumps(results, compact=compact))
+        logger.info(f"Detailed results saved to {args.output}")
 
     # Exit with appropriate code
     if results["overall"]["status"] == "success":
@@ -1,18 +1,84 @@
 #!/usr/bin/env python3
-import json
+import functools
 import os
-import random
 import subprocess
 import sys
+import threading
 import time
-import uuid
-from datetime import datetime, timezone
 
-import vertexai
-from vertexai.preview.generative_models import GenerationConfig, GenerativeModel
 
-# Initialize Vertex AI
-vertexai.init(project=os.environ.get("GCP_PROJECT"), location="us-central1")
+def _env_int(name, default):
+    """Read an integer setting, falling back to default if it is malformed."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️ Invalid {name}={value!r}, using {default}")
+        return default
+
+
+# Configuration, read once at startup
+GCP_PROJECT = os.environ.get("GCP_PROJECT")
+VEO_LIMIT_MPM = _env_int("VEO_LIMIT_MPM", 60)
+
+# Marker recording that this host's gcloud supports monitoring time-series
+CACHE_DIR = os.path.expanduser("~/.cache/veo_smoke")
+MONITORING_SENTINEL = os.path.join(CACHE_DIR, "gcloud_monitoring_ok")
+
+# Upper bound on each gcloud call so a hung CLI can't stall a deploy
+GCLOUD_TIMEOUT = 30
+
+
+@functools.lru_cache(maxsize=1)
+def init_vertexai():
+    """
+    Import and initialize Vertex AI once per process.
+
+    The SDK import pulls in gRPC and protobuf, so it is deferred until a clip
+    is actually going to be generated rather than paid at module import.
+    Later calls, e.g. when the module is imported by tests, reuse the first
+    initialization.
+
+    Returns:
+        tuple: (GenerationConfig, GenerativeModel) classes
+    """
+    import vertexai
+    from vertexai.preview.generative_models import GenerationConfig, GenerativeModel
+
+    vertexai.init(project=GCP_PROJECT, location="us-central1")
+    return GenerationConfig, GenerativeModel
+
+
+@functools.lru_cache(maxsize=1)
+def gcloud_monitoring_available():
+    """
+    Check whether gcloud supports monitoring time-series queries.
+
+    A single help call answers this, and a positive answer is remembered on
+    disk since it only changes when gcloud itself does. A negative answer
+    isn't stored, so installing the component is picked up on the next run.
+
+    Returns:
+        bool: True if `gcloud monitoring time-series list` is usable
+    """
+    if os.path.exists(MONITORING_SENTINEL):
+        return True
+
+    cmd = ["gcloud", "monitoring", "time-series", "list", "--help"]
+    result = subprocess.run(
+        cmd, capture_output=True, text=True, check=False, timeout=GCLOUD_TIMEOUT
+    )
+    if result.returncode != 0:
+        return False
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        open(MONITORING_SENTINEL, "w").close()
+    except OSError:
+        pass
+    return True
 
 
 def check_veo_tokens_available():
@@ -25,38 +91,18 @@ def check_veo_tokens_available():
     """
     try:
         # Get current token usage from monitoring API
-        project_id = os.environ.get("GCP_PROJECT")
+        project_id = GCP_PROJECT
         if not project_id:
             print("❌ No project ID specified. Set GCP_PROJECT environment variable.")
             return False
 
-        # Check if gcloud monitoring is available
-        check_cmd = ["gcloud", "help", "monitoring"]
-        check_result = subprocess.run(
-            check_cmd, capture_output=True, text=True, check=False
-        )
-
-        if (
-            check_result.returncode != 0
-            or "ERROR: (gcloud.monitoring)" in check_result.stderr
-        ):
+        # Check if gcloud monitoring time-series is available
+        if not gcloud_monitoring_available():
             print(
-                "⚠️ gcloud monitoring not available in this environment, skipping token check"
+                "⚠️ gcloud monitoring time-series not available in this environment, skipping token check"
             )
             return True
 
-        # First check if time-series command is available
-        cmd = ["gcloud", "monitoring", "time-series", "--help"]
-
-        help_result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-
-        if (
-            help_result.returncode != 0
-            or "Invalid choice: 'time-series'" in help_result.stderr
-        ):
-            print("⚠️ gcloud monitoring time-series not available, skipping token check")
-            return True
-
         # Now try to get the token usage
         cmd = [
             "gcloud",
@@ -69,7 +115,9 @@ def check_veo_tokens_available():
             "--format=value(point.value.int64Value)",
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        result = subprocess.run(
+            cmd, capture_output=True, text=True, check=False, timeout=GCLOUD_TIMEOUT
+        )
 
         if result.returncode != 0:
             print(f"⚠️ Could not check token usage: {result.stderr}")
@@ -81,8 +129,8 @@ def check_veo_tokens_available():
         if result.stdout.strip():
             tokens_in_use = int(result.stdout.strip())
 
-        # Get max tokens per minute from env or use default 60
-        max_tokens_per_minute = int(os.environ.get("VEO_LIMIT_MPM", 60))
+        # Max tokens per minute from VEO_LIMIT_MPM, default 60
+        max_tokens_per_minute = VEO_LIMIT_MPM
         tokens_needed = 10  # Minimal smoke test needs ~10 tokens
 
         tokens_available = max_tokens_per_minute - tokens_in_use
@@ -109,6 +157,12 @@ def generate_test_clip():
     Generate a test video clip using Veo.
     Returns 0 on success, 1 on error, 2 on quota limit.
     """
+    # The token check only waits on gcloud, so the SDK import and init run
+    # alongside it instead of after it. The init thread is a daemon, so
+    # skipping the test doesn't wait for it to finish.
+    init_thread = threading.Thread(target=init_vertexai, daemon=True)
+    init_thread.start()
+
     # Check if we have tokens available before attempting the test
     if not check_veo_tokens_available():
         print(
@@ -116,6 +170,11 @@ def generate_test_clip():
         )
         return 0  # Allow deploy to proceed
 
+    # init_vertexai() caches its result, so this returns the thread's
+    # initialization, or raises its error again if it failed
+    init_thread.join()
+    GenerationConfig, GenerativeModel = init_vertexai()
+
     # Ultra minimal prompt for smoke test
     prompt = "smoke-test"
     print(f"📋 Using minimal prompt: {prompt}")
@@ -123,31 +182,39 @@ def generate_test_clip():
     # Veo model generation with retry logic
     max_retries = 3
     retry_count = 0
+    window_start = None  # Monotonic time of the first request
+
+    # The model and config are built on the first attempt and reused across
+    # retries; building them inside the try gives construction errors the
+    # same permission/quota handling as the request itself
+    model = gen_config = None
 
     while retry_count <= max_retries:
         try:
-            if retry_count == 0:
+            if model is None:
+                # Configure for absolute minimum token usage
+                gen_config = GenerationConfig(
+                    temperature=0.4,
+                    top_p=1.0,
+                    top_k=32,
+                    candidate_count=1,
+                    max_output_tokens=2048,
+                    # Add any params that would reduce token usage
+                )
+
                 print("📋 Loading Veo model...")
-            else:
+                model = GenerativeModel("veo-3.0-generate-preview")
+
+            if retry_count > 0:
                 print(
                     f"📋 Retry attempt {retry_count}/{max_retries} after quota limit..."
                 )
 
-            model = GenerativeModel("veo-3.0-generate-preview")
-
             print("🎬 Generating minimal token request...")
 
-            # Configure for absolute minimum token usage
-            gen_config = GenerationConfig(
-                temperature=0.4,
-                top_p=1.0,
-                top_k=32,
-                candidate_count=1,
-                max_output_tokens=2048,
-                # Add any params that would reduce token usage
-            )
-
             start_time = time.time()
+            if window_start is None:
+                window_start = time.monotonic()
 
             # Use the cheapest possible prompt and configuration
             # Setting up the absolute minimal request
@@ -200,11 +267,11 @@ def generate_test_clip():
                     )
                     return 0  # Return success to allow deployment to proceed
 
-                # Wait for the next minute window instead of exponential backoff
-                current_second = datetime.now(timezone.utc).second
-                sleep_time = (
-                    60 - current_second + 1
-                )  # Wait until the start of the next minute
+                # Wait for the next minute window instead of exponential backoff,
+                # measured from the first request on the monotonic clock, so
+                # time already spent on the failed request counts towards it
+                elapsed = (time.monotonic() - window_start) % 60
+                sleep_time = int(60 - elapsed) + 1
                 print(f"⏱️ Waiting for next quota window: {sleep_time}s")
                 time.sleep(sleep_time)
             elif "permission" in error_str or "unauthorized" in error_str:
@@ -3,6 +3,8 @@
 Simple test to validate GPU machine type mappings
 """
 
+import itertools
+
 # Inline the mapping to avoid import issues
 REGION_GPU_MACHINE_MAP = {
     "us-central1": {
@@ -64,19 +66,40 @@ REGION_GPU_MACHINE_MAP = {
 }
 
 
+# Region names with parallel L4 availability masks, built once at load
+REGIONS = tuple(REGION_GPU_MACHINE_MAP)
+L4_MASK = bytes("NVIDIA_L4" in gpu_map for gpu_map in REGION_GPU_MACHINE_MAP.values())
+T4_ONLY_MASK = bytes(not has_l4 for has_l4 in L4_MASK)
+
+EXPECTED_L4_REGIONS = frozenset(
+    [
+        "us-central1",
+        "europe-west1",
+        "us-east4",
+        "us-west4",
+        "europe-west3",
+        "europe-west4",
+        "asia-east1",
+        "asia-southeast1",
+        "asia-northeast1",
+    ]
+)
+
+EXPECTED_T4_ONLY = frozenset(["us-west1", "us-east1"])
+
+
 def test_mappings():
     """Test the GPU machine type mappings"""
     print("🧪 Testing GPU machine type mappings...")
 
-    l4_regions = []
-    t4_only_regions = []
+    l4_regions = list(itertools.compress(REGIONS, L4_MASK))
+    t4_only_regions = list(itertools.compress(REGIONS, T4_ONLY_MASK))
 
     for region, gpu_map in REGION_GPU_MACHINE_MAP.items():
         print(f"\n📍 Region: {region}")
 
         # Check L4 availability
         if "NVIDIA_L4" in gpu_map:
-            l4_regions.append(region)
             machine_type = gpu_map["NVIDIA_L4"]
             if machine_type == "g2-standard-8":
                 print(f"  ✅ L4 -> {machine_type}")
@@ -105,34 +128,16 @@ def test_mappings():
         else:
             print(f"  ❌ CPU missing (should be available in all regions)")
 
-        if "NVIDIA_L4" not in gpu_map:
-            t4_only_regions.append(region)
-
     print(f"\n📊 Summary:")
     print(f"  L4 + T4 regions: {len(l4_regions)} - {l4_regions}")
     print(f"  T4-only regions: {len(t4_only_regions)} - {t4_only_regions}")
     print(f"  Total regions: {len(REGION_GPU_MACHINE_MAP)}")
 
-    # Validate expected patterns
-    expected_l4_regions = [
-        "us-central1",
-        "europe-west1",
-        "us-east4",
-        "us-west4",
-        "europe-west3",
-        "europe-west4",
-        "asia-east1",
-        "asia-southeast1",
-        "asia-northeast1",
-    ]
-
-    expected_t4_only = ["us-west1", "us-east1"]
-
     print(f"\n🎯 Validation:")
 
     # Check L4 regions
-    missing_l4 = set(expected_l4_regions) - set(l4_regions)
-    extra_l4 = set(l4_regions) - set(expected_l4_regions)
+    missing_l4 = EXPECTED_L4_REGIONS.difference(l4_regions)
+    extra_l4 = frozenset(l4_regions) - EXPECTED_L4_REGIONS
 
     if not missing_l4 and not extra_l4:
         print(f"  ✅ L4 regions match expected")
@@ -143,8 +148,8 @@ def test_mappings():
             print(f"  ⚠️ Extra L4 regions: {extra_l4}")
 
     # Check T4-only regions
-    missing_t4_only = set(expected_t4_only) - set(t4_only_regions)
-    extra_t4_only = set(t4_only_regions) - set(expected_t4_only)
+    missing_t4_only = EXPECTED_T4_ONLY.difference(t4_only_regions)
+    extra_t4_only = frozenset(t4_only_regions) - EXPECTED_T4_ONLY
 
     if not missing_t4_only and not extra_t4_only:
         print(f"  ✅ T4-only regions match expected")
@@ -1,71 +1,594 @@
+import functools
+import hashlib
+import json
 import logging
 import os
 import random
+import re
+import threading
 import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from datetime import datetime
+from types import SimpleNamespace
 
 import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, OpenAI, RateLimitError
+
+# HTTP/2 lets concurrent requests share one TLS connection; it needs the h2
+# package (httpx[http2])
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# orjson is used for the response cache when installed
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# tiktoken gives exact token counts when capping story length; without it
+# tokens are estimated from the character count
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# numpy is needed for the semantic story cache
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
 
-# Global client variable for lazy initialization
-client = None
+# Guards the first construction of the shared OpenAI client
+_CLIENT_LOCK = threading.Lock()
+
+# On-disk cache of chat completions, keyed by the request parameters.
+# Set STORY_CACHE_DISABLE=1 to always call the API.
+LLM_CACHE_DIR = os.path.join("output", ".llm_cache")
+# Cached completions older than this many seconds are ignored (default 7 days)
+LLM_CACHE_TTL = int(os.getenv("STORY_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# Entries kept on disk; the oldest are evicted when a write goes past it
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("STORY_CACHE_MAX_ENTRIES", "1000"))
+# Sampled responses are only cached at or below this temperature, unless a
+# seed is pinned; otherwise every rerun would get the same "creative" output
+LLM_CACHE_MAX_TEMPERATURE = 0.3
+
+# Stories are reused for near-identical prompts, when the cosine similarity
+# of their embeddings exceeds SEMANTIC_CACHE_THRESHOLD. Opt in with
+# STORY_SEMANTIC_CACHE=1.
+SEMANTIC_CACHE_DIR = os.path.join(LLM_CACHE_DIR, "semantic")
+SEMANTIC_CACHE_THRESHOLD = 0.92
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Concurrent requests for batch generation, kept within the client's keepalive pool
+MAX_CONCURRENT_REQUESTS = 5
+
+# Model for turning a story into image prompts, a structured task that
+# doesn't need the story model
+PROMPT_EXTRACTION_MODEL = os.getenv("PROMPT_EXTRACTION_MODEL", "gpt-4o-mini")
+# Completion budget per image prompt, including JSON quoting
+TOKENS_PER_IMAGE_PROMPT = 100
+# Longer stories are cut to their first STORY_HEAD_TOKENS and last
+# STORY_TAIL_TOKENS before image prompt extraction
+MAX_STORY_TOKENS = 2000
+STORY_HEAD_TOKENS = 1500
+STORY_TAIL_TOKENS = 500
+# Rough characters per token, used when tiktoken isn't installed
+CHARS_PER_TOKEN = 4
+
+# System prompts are fixed strings, with everything request-specific in the
+# user message, so repeated requests share an identical prefix that OpenAI
+# can serve from its prompt cache
+STORY_SYSTEM_PROMPT = (
+    "You are a creative storyteller. Write engaging, vivid stories suitable for "
+    "video content."
+)
+STORY_AND_PROMPTS_SYSTEM_PROMPT = (
+    "You are a creative storyteller. Write engaging, vivid stories suitable for "
+    "video content, and detailed image prompts for their key scenes, perfect "
+    'for AI image generation. Return JSON with keys "story" (string) and '
+    '"image_prompts" (list of strings).'
+)
+IMAGE_PROMPT_SYSTEM_PROMPT = (
+    "You are an expert at creating detailed image prompts from stories. Create "
+    "vivid, specific prompts perfect for AI image generation. Given a story, "
+    "create image prompts that capture its key scenes, making each prompt "
+    "detailed and descriptive."
+)
+
+# List numbering/bullets ("1.", "2)", "3:", "- ") before an image prompt
+_PROMPT_PREFIX = re.compile(r"^\s*(?:\d+[.):-]|[-*])\s*")
+
+# Seconds the request rate stays halved after a rate-limit (429) response
+RATE_LIMIT_COOLDOWN = 30
+
+# Full-jitter backoff: retry n waits a random time in
+# [0, min(BACKOFF_CAP, BACKOFF_BASE * 2**n)] seconds
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 15.0
+
+# Longest gap allowed between streamed chunks before the attempt is retried
+STREAM_IDLE_TIMEOUT = 20
+
+
+class MalformedResponseError(ValueError):
+    """Raised when an OpenAI response doesn't have the requested structure"""
+
+    pass
+
+
+class _TokenBucket:
+    """
+    Process-wide token bucket pacing OpenAI requests across threads.
+
+    Tokens refill at `rate` per second up to `capacity`. After a rate-limit
+    response the refill rate is halved for RATE_LIMIT_COOLDOWN seconds.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.throttled_until = 0.0
+        self.lock = threading.Lock()
+
+    def _current_rate(self, now):
+        return self.rate / 2 if now < self.throttled_until else self.rate
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                rate = self._current_rate(now)
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / rate
+            time.sleep(wait)
+
+    def throttle(self):
+        """Halve the refill rate for the next RATE_LIMIT_COOLDOWN seconds."""
+        with self.lock:
+            self.throttled_until = time.monotonic() + RATE_LIMIT_COOLDOWN
+
+
+def _positive_setting(name, default, minimum):
+    """Read a numeric setting, raising values below minimum to it."""
+    value = type(default)(os.getenv(name, str(default)))
+    if value < minimum:
+        logging.warning(f"{name}={value} is too low, using {minimum}")
+        return minimum
+    return value
+
+
+# A rate or capacity of zero would never let a request through
+OPENAI_TPS = _positive_setting("OPENAI_TPS", 5.0, 0.1)
+OPENAI_MAX_INFLIGHT = _positive_setting("OPENAI_MAX_INFLIGHT", 5, 1)
+
+_RATE_BUCKET = _TokenBucket(rate=OPENAI_TPS, capacity=OPENAI_MAX_INFLIGHT)
+_INFLIGHT = threading.Semaphore(OPENAI_MAX_INFLIGHT)
+# Held by a caller retrying after a 429, so only one such retry is in flight
+_RATE_LIMIT_RETRY_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _build_client():
+    """Build the OpenAI client with robust configuration."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+    # Create a custom HTTP client with better timeout settings
+    http_client = httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(
+            connect=10.0,  # 10 seconds to establish connection
+            read=60.0,  # 60 seconds to read response
+            write=10.0,  # 10 seconds to write request
+            pool=5.0,  # 5 seconds to get connection from pool
+        ),
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120.0,
+        ),
+    )
+
+    client = OpenAI(
+        api_key=api_key,
+        organization=os.getenv("OPENAI_ORG_ID"),
+        base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
+        http_client=http_client,
+    )
+    logging.info(
+        f"✅ OpenAI client initialized with robust configuration "
+        f"(HTTP/2: {HTTP2_AVAILABLE})"
+    )
+    return client
 
 
 def get_openai_client():
     """Get or initialize the OpenAI client with robust configuration."""
-    global client
-    if client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-
-        # Create a custom HTTP client with better timeout settings
-        http_client = httpx.Client(
-            timeout=httpx.Timeout(
-                connect=10.0,  # 10 seconds to establish connection
-                read=60.0,  # 60 seconds to read response
-                write=10.0,  # 10 seconds to write request
-                pool=5.0,  # 5 seconds to get connection from pool
-            ),
-            limits=httpx.Limits(
-                max_keepalive_connections=5,
-                max_connections=10,
-                keepalive_expiry=30.0,
-            ),
-        )
+    # lru_cache alone can run the factory twice under concurrent first calls
+    with _CLIENT_LOCK:
+        return _build_client()
 
-        client = OpenAI(
-            api_key=api_key,
-            organization=os.getenv("OPENAI_ORG_ID"),
-            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-            http_client=http_client,
-        )
-        logging.info("✅ OpenAI client initialized with robust configuration")
-    return client
+
+def _cache_key(kwargs):
+    """Return the cache key for a chat completion request."""
+    if ORJSON_AVAILABLE:
+        canonical = orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS, default=str)
+    else:
+        canonical = json.dumps(
+            kwargs, sort_keys=True, separators=(",", ":"), default=str
+        ).encode("utf-8")
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def _is_cacheable(kwargs):
+    """Return True if responses to this request are deterministic enough to cache."""
+    if kwargs.get("stream"):
+        return False
+    return (
+        kwargs.get("temperature", 1.0) <= LLM_CACHE_MAX_TEMPERATURE
+        or kwargs.get("seed") is not None
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def _read_cached_completion(key):
+    """Return (content, mtime) for a cached completion, raising KeyError on a miss."""
+    try:
+        with open(os.path.join(LLM_CACHE_DIR, f"{key}.json"), "rb") as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            data = f.read()
+        payload = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+        return payload["content"], mtime
+    except (OSError, ValueError, KeyError):
+        # Misses raise rather than return, so lru_cache doesn't remember them
+        raise KeyError(key)
+
+
+def _cached_completion(key):
+    """Return the cached completion text for key, raising KeyError on a miss."""
+    content, mtime = _read_cached_completion(key)
+    if time.time() - mtime > LLM_CACHE_TTL:
+        raise KeyError(key)
+    return content
+
+
+def _save_completion(key, content):
+    """Atomically write a completion to the on-disk cache."""
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps({"content": content})
+        else:
+            data = json.dumps({"content": content}).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _prune_cache()
+        # Drop in-memory copies of entries this replaced or evicted
+        _read_cached_completion.cache_clear()
+    except OSError as e:
+        logging.warning(f"Could not cache OpenAI response: {e}")
+
+
+def _prune_cache():
+    """Delete expired completions, then the oldest past LLM_CACHE_MAX_ENTRIES."""
+    entries = []
+    with os.scandir(LLM_CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Removed by another process since the directory was listed
+                continue
+
+    # Newest first, so everything from LLM_CACHE_MAX_ENTRIES on is evicted
+    entries.sort(reverse=True)
+    expired_before = time.time() - LLM_CACHE_TTL
+    for index, (mtime, path) in enumerate(entries):
+        if index >= LLM_CACHE_MAX_ENTRIES or mtime < expired_before:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class _SemanticCache:
+    """
+    Stories indexed by the embedding of the prompt that produced them.
+
+    Entries are grouped by namespace (embedding model, story model and
+    length), so changing either model starts a fresh index. Embeddings are
+    normalized and stored as float16 on disk.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def _paths(self, namespace):
+        base = os.path.join(self.directory, namespace)
+        return f"{base}.npy", f"{base}.json"
+
+    def _load(self, namespace):
+        """Return (vectors, stories) for namespace; call with the lock held."""
+        if namespace not in self.indexes:
+            vectors_path, stories_path = self._paths(namespace)
+            try:
+                vectors = np.load(vectors_path, mmap_mode="r")
+                with open(stories_path, "rb") as f:
+                    stories = json.loads(f.read())
+                if len(stories) != len(vectors):
+                    raise ValueError("index and stories are out of sync")
+            except (OSError, ValueError) as e:
+                if not isinstance(e, FileNotFoundError):
+                    logging.warning(f"Ignoring unreadable semantic cache: {e}")
+                vectors, stories = None, []
+            self.indexes[namespace] = (vectors, stories)
+        return self.indexes[namespace]
+
+    def lookup(self, namespace, vector):
+        """Return the story for the most similar prompt above the threshold."""
+        with self.lock:
+            vectors, stories = self._load(namespace)
+        if vectors is None:
+            return None
+        similarities = vectors @ vector.astype(np.float16)
+        best = int(np.argmax(similarities))
+        if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+            return None
+        logging.info(f"Semantic cache hit (similarity {similarities[best]:.3f})")
+        return stories[best]
+
+    def store(self, namespace, vector, story):
+        """Add a story to the index and write it to disk."""
+        with self.lock:
+            vectors, stories = self._load(namespace)
+            row = vector.astype(np.float16)[np.newaxis, :]
+            vectors = row if vectors is None else np.vstack([vectors, row])
+            stories = stories + [story]
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                vectors_path, stories_path = self._paths(namespace)
+                suffix = f".{os.getpid()}.tmp"
+                with open(vectors_path + suffix, "wb") as f:
+                    np.save(f, vectors)
+                with open(stories_path + suffix, "w", encoding="utf-8") as f:
+                    json.dump(stories, f)
+                os.replace(vectors_path + suffix, vectors_path)
+                os.replace(stories_path + suffix, stories_path)
+            except OSError as e:
+                logging.warning(f"Could not update semantic cache: {e}")
+            self.indexes[namespace] = (vectors, stories)
 
 
-def call_openai_with_backoff(max_retries=3, max_time=60, **kwargs):
+_SEMANTIC_CACHE = _SemanticCache(SEMANTIC_CACHE_DIR)
+
+
+def _semantic_cache_enabled():
+    return (
+        NUMPY_AVAILABLE
+        and os.getenv("STORY_SEMANTIC_CACHE") == "1"
+        and os.getenv("STORY_CACHE_DISABLE") != "1"
+    )
+
+
+def _embed_prompt(prompt):
+    """Return the normalized embedding of prompt."""
+    client = get_openai_client()
+    # Embedding requests count against the same limits as chat completions
+    _RATE_BUCKET.acquire()
+    with _INFLIGHT:
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=prompt)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+# main.log_api_call, resolved on first use. main imports this module, so it
+# can't be imported at load time without getting a partially built main.
+_api_call_logger = None
+
+
+def _log_api_call(success, duration):
+    """Report an OpenAI call to main's monitoring, if main is available."""
+    global _api_call_logger
+    if _api_call_logger is None:
+        try:
+            from main import log_api_call
+
+            _api_call_logger = log_api_call
+        except ImportError:
+            # main.py not available (e.g., during testing)
+            _api_call_logger = lambda *args, **kwargs: None  # noqa: E731
+    _api_call_logger("openai", success, duration)
+
+
+def _create_chat_completion(client, kwargs, single_flight=False):
+    """
+    Send one chat completion request within the shared rate limits.
+
+    Args:
+        client: The OpenAI client
+        kwargs (dict): Arguments for client.chat.completions.create
+        single_flight (bool): Serialize with other callers retrying after a
+            rate-limit response
+    """
+    if single_flight:
+        with _RATE_LIMIT_RETRY_LOCK:
+            return _create_chat_completion(client, kwargs)
+
+    _RATE_BUCKET.acquire()
+    _INFLIGHT.acquire()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except BaseException:
+        _INFLIGHT.release()
+        raise
+    if kwargs.get("stream"):
+        # The body is read after create() returns; the slot is released
+        # when the caller closes the stream
+        return _InflightStream(response)
+    _INFLIGHT.release()
+    return response
+
+
+class _InflightStream:
+    """
+    A streamed chat completion holding an _INFLIGHT slot until it is closed.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.released = False
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            if not self.released:
+                self.released = True
+                _INFLIGHT.release()
+
+
+def _completion_response(content, finish_reason=None):
+    """Wrap completion text so it reads like a chat completion response."""
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(content=content), finish_reason=finish_reason
+            )
+        ]
+    )
+
+
+def _collect_stream(stream, idle_timeout):
+    """
+    Join a streamed chat completion into a single response.
+
+    Raises TimeoutError if more than idle_timeout seconds pass between chunks.
+    """
+    parts = []
+    finish_reason = None
+    last_chunk = time.monotonic()
+    try:
+        for chunk in stream:
+            now = time.monotonic()
+            if now - last_chunk > idle_timeout:
+                raise TimeoutError(
+                    f"No data from OpenAI stream for {now - last_chunk:.1f}s"
+                )
+            last_chunk = now
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or "")
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+    finally:
+        stream.close()
+    return _completion_response("".join(parts), finish_reason)
+
+
+def _is_retryable(error):
+    """Return True if a failed OpenAI call is worth retrying."""
+    if isinstance(error, APIStatusError):
+        # 4xx responses other than rate limits fail the same way every time
+        return isinstance(error, RateLimitError) or error.status_code >= 500
+    # Connection errors and timeouts (APITimeoutError is an APIConnectionError),
+    # stalled streams, and responses rejected by validate
+    return isinstance(
+        error,
+        (
+            APIConnectionError,
+            httpx.TransportError,
+            TimeoutError,
+            MalformedResponseError,
+        ),
+    )
+
+
+def call_openai_with_backoff(
+    max_retries=3,
+    max_time=60,
+    stream_idle_timeout=None,
+    validate=None,
+    cancel_event=None,
+    **kwargs,
+):
     """
     Call OpenAI API with exponential backoff and jitter.
 
     Args:
         max_retries (int): Maximum number of retry attempts
         max_time (int): Maximum total time to spend retrying
+        stream_idle_timeout (float): If set, stream the completion and retry
+            when no chunk arrives for this many seconds, instead of waiting
+            for the whole response in one read
+        validate (callable): Called with the response content; a
+            MalformedResponseError marks the response unusable, and it is
+            retried and not cached. A response cut off at max_tokens is
+            retried with twice the budget
+        cancel_event (threading.Event): When set, stop retrying and raise
+            CancelledError, including part way through a backoff delay
         **kwargs: Arguments to pass to the OpenAI API call
 
     Returns:
-        OpenAI response object
+        OpenAI response object, or an equivalent object exposing
+        choices[0].message.content when served from the cache
     """
-    start_time = time.time()
+    use_cache = os.getenv("STORY_CACHE_DISABLE") != "1" and _is_cacheable(kwargs)
+    if use_cache:
+        cache_key = _cache_key(kwargs)
+        try:
+            content = _cached_completion(cache_key)
+            logging.info("OpenAI response served from cache")
+            return _completion_response(content)
+        except KeyError:
+            pass
+
+    request = kwargs
+    if stream_idle_timeout:
+        request = dict(kwargs, stream=True)
+
+    start_time = time.monotonic()
+    rate_limited = False
 
     for attempt in range(max_retries):
-        # Check if we've exceeded the total time limit
-        if time.time() - start_time > max_time:
-            duration = time.time() - start_time
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError("OpenAI API call cancelled")
+
+        # Check if we've exceeded the total time limit (not on the first try)
+        if attempt and time.monotonic() - start_time > max_time:
+            duration = time.monotonic() - start_time
             logging.error(
                 f"OpenAI API call timed out after {max_time} seconds (actual: {duration:.1f}s)"
             )
@@ -73,71 +596,102 @@ def call_openai_with_backoff(max_retries=3, max_time=60, **kwargs):
 
         try:
             client = get_openai_client()
+            if stream_idle_timeout:
+                # The read timeout applies per chunk while streaming
+                client = client.with_options(
+                    timeout=httpx.Timeout(
+                        connect=10.0, read=stream_idle_timeout, write=10.0, pool=5.0
+                    )
+                )
             logging.info(f"OpenAI API call attempt {attempt + 1}/{max_retries}")
 
-            call_start = time.time()
-            response = client.chat.completions.create(**kwargs)
-            call_duration = time.time() - call_start
+            call_start = time.perf_counter()
+            response = _create_chat_completion(
+                client, request, single_flight=rate_limited
+            )
+            if stream_idle_timeout:
+                response = _collect_stream(response, stream_idle_timeout)
+            call_duration = time.perf_counter() - call_start
+            if validate:
+                try:
+                    validate(response.choices[0].message.content)
+                except MalformedResponseError:
+                    if (
+                        response.choices[0].finish_reason == "length"
+                        and "max_tokens" in request
+                    ):
+                        # The same request would be cut off again, so give
+                        # the retry a larger completion budget
+                        request = dict(request, max_tokens=request["max_tokens"] * 2)
+                        logging.warning(
+                            "OpenAI response was cut off at max_tokens, "
+                            f"retrying with max_tokens={request['max_tokens']}"
+                        )
+                    raise
 
             logging.info(
                 f"OpenAI API call successful on attempt {attempt + 1} (duration: {call_duration:.2f}s)"
             )
 
             # Log successful API call for monitoring
-            try:
-                # Try to import the logging function, but don't fail if not available
-                from main import log_api_call
+            _log_api_call(True, call_duration)
 
-                log_api_call("openai", True, call_duration)
-            except ImportError:
-                pass  # main.py not available (e.g., during testing)
+            content = response.choices[0].message.content
+            if use_cache and isinstance(content, str):
+                _save_completion(cache_key, content)
 
             return response
 
         except Exception as e:
-            call_duration = time.time() - start_time
+            call_duration = time.monotonic() - start_time
+            rate_limited = isinstance(e, RateLimitError)
+            if rate_limited:
+                _RATE_BUCKET.throttle()
             logging.warning(
                 f"OpenAI API call attempt {attempt + 1} failed after {call_duration:.2f}s: {str(e)}"
             )
 
             # Log failed API call for monitoring
-            try:
-                from main import log_api_call
+            _log_api_call(False, call_duration)
 
-                log_api_call("openai", False, call_duration)
-            except ImportError:
-                pass
+            if not _is_retryable(e):
+                logging.error(f"OpenAI API call failed with a non-retryable error: {e}")
+                raise
 
             # Don't retry on the last attempt
             if attempt == max_retries - 1:
-                total_duration = time.time() - start_time
+                total_duration = time.monotonic() - start_time
                 logging.error(
                     f"OpenAI API failed after {max_retries} attempts (total duration: {total_duration:.2f}s)"
                 )
                 raise Exception(
                     f"OpenAI API failed after {max_retries} attempts: {str(e)}"
-                )
+                ) from e
 
-            # Calculate exponential backoff with jitter
-            base_delay = 2**attempt  # 1, 2, 4 seconds
-            jitter = random.uniform(0, 1)  # Add randomness to avoid thundering herd
-            delay = base_delay + jitter
+            # Exponential backoff with full jitter, so callers that failed
+            # together don't retry together
+            delay = random.uniform(
+                0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1))
+            )
 
-            # Don't delay if we're close to the time limit
-            remaining_time = max_time - (time.time() - start_time)
-            if remaining_time <= delay:
+            # Near the time limit, shorten the delay to leave time for the retry
+            remaining_time = max_time - (time.monotonic() - start_time)
+            if remaining_time <= 2 * delay:
+                delay = max(remaining_time, 0) / 2
                 logging.warning(
-                    f"Skipping delay due to time limit (remaining: {remaining_time:.1f}s)"
+                    f"Shortening delay due to time limit (remaining: {remaining_time:.1f}s)"
                 )
-                continue
 
             logging.info(f"Retrying in {delay:.1f} seconds...")
-            time.sleep(delay)
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise CancelledError("OpenAI API call cancelled")
 
     raise Exception(f"OpenAI API failed after {max_retries} attempts")
 
 
-def generate_story(prompt, timeout=90, max_length=None):
+def generate_story(prompt, timeout=90, max_length=None, cancel_event=None):
     """
     Generate a story from a prompt with enhanced retry logic.
 
@@ -145,6 +699,8 @@ def generate_story(prompt, timeout=90, max_length=None):
         prompt (str): The story prompt
         timeout (int): Maximum time in seconds to wait for story generation
         max_length (int): Optional maximum length for the story (in tokens)
+        cancel_event (threading.Event): Set to abandon the story between
+            retry attempts
 
     Returns:
         tuple: (story, prompt)
@@ -157,15 +713,29 @@ def generate_story(prompt, timeout=90, max_length=None):
     # Default to 500 tokens if max_length is not specified
     tokens = max_length if max_length else 500
 
+    vector = None
+    if _semantic_cache_enabled():
+        namespace = f"{EMBEDDING_MODEL}_gpt-3.5-turbo_{tokens}"
+        try:
+            vector = _embed_prompt(prompt)
+            story = _SEMANTIC_CACHE.lookup(namespace, vector)
+            if story is not None:
+                return story, prompt
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed: {e}")
+
     try:
         response = call_openai_with_backoff(
             max_retries=3,
             max_time=timeout,
+            # Streaming keeps long stories from stalling behind proxy timeouts
+            stream_idle_timeout=STREAM_IDLE_TIMEOUT,
+            cancel_event=cancel_event,
             model="gpt-3.5-turbo",
             messages=[
                 {
                     "role": "system",
-                    "content": "You are a creative storyteller. Write engaging, vivid stories suitable for video content.",
+                    "content": STORY_SYSTEM_PROMPT,
                 },
                 {
                     "role": "user",
@@ -178,66 +748,366 @@ def generate_story(prompt, timeout=90, max_length=None):
 
         story = response.choices[0].message.content.strip()
         logging.info(f"Successfully generated story (length: {len(story)} characters)")
+        if vector is not None:
+            _SEMANTIC_CACHE.store(namespace, vector, story)
         return story, prompt
 
-    except Exception as e:
-        logging.error(f"Story generation failed: {str(e)}")
-        raise Exception(f"Story generation timed out")
+    except Exception:
+        # call_openai_with_backoff has already retried; keep the original error
+        logging.exception("Story generation failed")
+        raise
 
 
-def extract_image_prompts(story, num_scenes=5, timeout=60):
-    """Extract image prompts from the story with enhanced retry logic."""
+def _parse_story_and_prompts(content):
+    """
+    Return (story, image_prompts) from a JSON story-and-prompts response.
+
+    Raises MalformedResponseError if the response has no story. Missing or
+    invalid image prompts give an empty list, since they can be extracted
+    separately.
+    """
     try:
-        logging.info(f"Extracting {num_scenes} image prompts from story...")
+        result = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+        story = result["story"].strip()
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise MalformedResponseError(
+            f"Malformed story response from OpenAI: {e!r}"
+        ) from e
+    if not story:
+        raise MalformedResponseError("Malformed story response from OpenAI: no story")
 
-        prompt = f"""
-        Given this story, create exactly {num_scenes} detailed image prompts that capture key scenes.
-        Make each prompt detailed and descriptive for AI image generation.
-        Format as a numbered list.
-        
-        Story: {story}
-        """
+    image_prompts = result.get("image_prompts")
+    if not isinstance(image_prompts, list):
+        image_prompts = []
+    image_prompts = [p.strip() for p in image_prompts if isinstance(p, str)]
+    return story, [p for p in image_prompts if p]
 
-        response = call_openai_with_backoff(
-            max_retries=3,
-            max_time=timeout,
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert at creating detailed image prompts from stories. Create vivid, specific prompts perfect for AI image generation.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-            max_tokens=1000,
+
+def generate_story_and_prompts(prompt, num_scenes=5, timeout=90, max_length=None):
+    """
+    Generate a story and its image prompts in a single chat completion.
+
+    Saves the second round trip of generate_story followed by
+    extract_image_prompts. If the response doesn't contain usable image
+    prompts, falls back to extract_image_prompts on the generated story.
+
+    Args:
+        prompt (str): The story prompt
+        num_scenes (int): Number of image prompts to generate
+        timeout (int): Maximum time in seconds to wait for the completion
+        max_length (int): Optional maximum length for the story (in tokens)
+
+    Returns:
+        tuple: (story, prompt, image_prompts)
+    """
+    logging.info(f"Generating story and {num_scenes} image prompts for: {prompt}")
+
+    # Leave room for the image prompts on top of the story itself
+    tokens = (max_length if max_length else 500) + num_scenes * 100
+
+    response = call_openai_with_backoff(
+        max_retries=3,
+        max_time=timeout,
+        stream_idle_timeout=STREAM_IDLE_TIMEOUT,
+        # Malformed or truncated JSON is retried like a failed call
+        validate=_parse_story_and_prompts,
+        model="gpt-3.5-turbo",
+        response_format={"type": "json_object"},
+        messages=[
+            {
+                "role": "system",
+                "content": STORY_AND_PROMPTS_SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Write a compelling short story about: {prompt}. Make it "
+                    "visual and engaging for video content. Then write exactly "
+                    f"{num_scenes} image prompts for its key scenes."
+                ),
+            },
+        ],
+        max_tokens=tokens,
+        temperature=0.7,
+    )
+
+    story, image_prompts = _parse_story_and_prompts(response.choices[0].message.content)
+    logging.info(f"Successfully generated story (length: {len(story)} characters)")
+
+    image_prompts = image_prompts[:num_scenes]
+    if len(image_prompts) < num_scenes:
+        logging.warning(
+            f"Response had {len(image_prompts)}/{num_scenes} image prompts, "
+            "extracting them separately"
         )
+        image_prompts = extract_image_prompts(story, num_scenes)
 
-        prompts_text = response.choices[0].message.content.strip()
-        prompts = [
-            p.strip()
-            for p in prompts_text.split("\n")
-            if p.strip() and not p.strip().isdigit()
-        ]
+    return story, prompt, image_prompts
 
-        # Clean up prompts (remove numbering if present)
-        cleaned_prompts = []
-        for p in prompts:
-            # Remove leading numbers and punctuation
-            cleaned = p.lstrip("0123456789. -")
-            if cleaned and len(cleaned) > 10:  # Ensure it's a real prompt
-                cleaned_prompts.append(cleaned)
 
-        logging.info(f"Generated {len(cleaned_prompts)} image prompts")
-        return cleaned_prompts[:num_scenes]
+def generate_stories(
+    prompts, timeout=90, max_length=None, max_workers=MAX_CONCURRENT_REQUESTS
+):
+    """
+    Generate stories for several prompts concurrently.
 
+    The requests share the pooled OpenAI client with at most max_workers in
+    flight, so a batch takes about as long as its slowest story rather than
+    the sum of all of them. If one story fails, the others stop retrying
+    and its error is raised.
+
+    Args:
+        prompts (list): The story prompts
+        timeout (int): Maximum time in seconds to wait for each story
+        max_length (int): Optional maximum length for each story (in tokens)
+        max_workers (int): Maximum number of requests in flight at once
+
+    Returns:
+        list: (story, prompt) tuples in the same order as prompts
+    """
+    # Build the shared client up front rather than in every worker
+    get_openai_client()
+
+    cancel_event = threading.Event()
+
+    def generate(prompt):
+        try:
+            return generate_story(prompt, timeout, max_length, cancel_event)
+        except Exception:
+            # The batch has failed; stop the other stories retrying
+            cancel_event.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(generate, prompt) for prompt in prompts]
+
+    # Raise the error that failed the batch, not a cancellation it caused
+    for future in futures:
+        error = future.exception()
+        if error is not None and not isinstance(error, CancelledError):
+            raise error
+    return [future.result() for future in futures]
+
+
+@functools.lru_cache(maxsize=None)
+def _token_encoding(model):
+    """Return the tiktoken encoding for model, or None if it can't be loaded."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
     except Exception as e:
+        # tiktoken downloads encodings on first use
+        logging.warning(f"Could not load tiktoken encoding, estimating tokens: {e}")
+        return None
+
+
+def _truncate_story(story, model):
+    """Keep the head and tail of a story longer than MAX_STORY_TOKENS."""
+    encoding = _token_encoding(model)
+    if encoding is None:
+        if len(story) <= MAX_STORY_TOKENS * CHARS_PER_TOKEN:
+            return story
+        head = story[: STORY_HEAD_TOKENS * CHARS_PER_TOKEN]
+        tail = story[-STORY_TAIL_TOKENS * CHARS_PER_TOKEN :]
+        return f"{head}\n...\n{tail}"
+
+    tokens = encoding.encode(story)
+    if len(tokens) <= MAX_STORY_TOKENS:
+        return story
+    head = encoding.decode(tokens[:STORY_HEAD_TOKENS])
+    tail = encoding.decode(tokens[-STORY_TAIL_TOKENS:])
+    return f"{head}\n...\n{tail}"
+
+
+def _image_prompt_request(story, num_scenes, structured=False):
+    """
+    Return the chat completion arguments for extracting image prompts.
+
+    With structured=True the prompts are requested as a JSON object
+    {"prompts": [...]}; otherwise as a numbered list, one prompt per line.
+    """
+    # Whitespace-only differences shouldn't change the request, its seed or
+    # its cache key
+    story = _truncate_story(" ".join(story.split()), PROMPT_EXTRACTION_MODEL)
+    # Python's hash() varies between processes, so derive the seed from sha256
+    digest = hashlib.sha256(story.encode("utf-8")).digest()
+    seed = int.from_bytes(digest[:4], "big") >> 1
+
+    if structured:
+        output_format = 'Respond with JSON: {"prompts": [...]}'
+    else:
+        output_format = "Format as a numbered list."
+    prompt = (
+        f"Create exactly {num_scenes} image prompts. {output_format}\n\n"
+        f"Story: {story}"
+    )
+
+    request = dict(
+        model=PROMPT_EXTRACTION_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": IMAGE_PROMPT_SYSTEM_PROMPT,
+            },
+            {"role": "user", "content": prompt},
+        ],
+        # A structured transformation, not creative writing: keep the output
+        # stable so repeated stories hit the response cache
+        temperature=0.2,
+        seed=seed,
+        max_tokens=min(1000, num_scenes * TOKENS_PER_IMAGE_PROMPT),
+    )
+    if structured:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def _parse_image_prompts(content):
+    """
+    Return the prompts from a JSON image prompt response.
+
+    Raises MalformedResponseError if the response isn't the requested JSON.
+    """
+    try:
+        data = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+        prompts = data["prompts"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise MalformedResponseError(f"Malformed image prompt response: {e!r}") from e
+    if not isinstance(prompts, list):
+        raise MalformedResponseError(
+            "Malformed image prompt response: prompts is not a list"
+        )
+    prompts = [p.strip() for p in prompts if isinstance(p, str)]
+    return [p for p in prompts if len(p) > 10]  # Ensure it's a real prompt
+
+
+def _clean_image_prompt(line):
+    """Strip list numbering from a response line; None if it isn't a prompt."""
+    # Remove leading numbers and punctuation
+    cleaned = _PROMPT_PREFIX.sub("", line).strip()
+    if len(cleaned) > 10:  # Ensure it's a real prompt
+        return cleaned
+    return None
+
+
+def extract_image_prompts(story, num_scenes=5, timeout=60):
+    """
+    Extract image prompts from the story with enhanced retry logic.
+
+    Returns None if the response has no usable content. API errors are
+    raised once call_openai_with_backoff has exhausted its retries.
+    """
+    logging.info(f"Extracting {num_scenes} image prompts from story...")
+
+    response = call_openai_with_backoff(
+        max_retries=3,
+        max_time=timeout,
+        # Malformed JSON is retried like a failed call
+        validate=_parse_image_prompts,
+        **_image_prompt_request(story, num_scenes, structured=True),
+    )
+
+    try:
+        cleaned_prompts = _parse_image_prompts(response.choices[0].message.content)
+    except (AttributeError, IndexError) as e:
         logging.error(f"Error extracting image prompts: {str(e)}")
         return None
 
+    logging.info(f"Generated {len(cleaned_prompts)} image prompts")
+    return cleaned_prompts[:num_scenes]
+
+
+def extract_image_prompts_batch(
+    stories, num_scenes=5, timeout=60, max_workers=MAX_CONCURRENT_REQUESTS
+):
+    """
+    Extract image prompts for several stories concurrently.
+
+    Requests share the pooled OpenAI client and the process-wide rate limit,
+    so at most max_workers are in flight at once.
+
+    Args:
+        stories (list): The stories to extract scenes from
+        num_scenes (int): Number of prompts per story
+        timeout (int): Maximum time in seconds to wait for each story
+        max_workers (int): Maximum number of requests in flight at once
+
+    Returns:
+        list: For each story, its image prompts, or the exception raised
+        while extracting them
+    """
+    get_openai_client()
+
+    def extract(story):
+        try:
+            return extract_image_prompts(story, num_scenes, timeout)
+        except Exception as e:
+            # One failed story shouldn't discard the rest of the batch
+            logging.warning(f"Image prompt extraction failed: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(extract, stories))
+
+
+def iter_image_prompts(story, num_scenes=5):
+    """
+    Yield image prompts from the story as the model streams them.
+
+    Each prompt is yielded as soon as its line is complete, so image
+    generation can start on the first scene while later ones are still
+    being written. The stream is closed once num_scenes prompts have been
+    yielded. Unlike extract_image_prompts, requests are not retried or
+    cached.
+
+    Args:
+        story (str): The story to extract scenes from
+        num_scenes (int): Number of prompts to yield
+
+    Yields:
+        str: Cleaned image prompts
+    """
+    if num_scenes <= 0:
+        return
+
+    response = _create_chat_completion(
+        get_openai_client(),
+        dict(_image_prompt_request(story, num_scenes), stream=True),
+    )
+    count = 0
+    buffer = ""
+    try:
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            buffer += chunk.choices[0].delta.content or ""
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                cleaned = _clean_image_prompt(line)
+                if cleaned:
+                    yield cleaned
+                    count += 1
+                    if count >= num_scenes:
+                        return
+
+        cleaned = _clean_image_prompt(buffer)
+        if cleaned:
+            yield cleaned
+    finally:
+        response.close()
+
 
 def save_story_with_image_prompts(
-    story, prompt, image_prompts, output_dir="output/text"
+    story,
+    prompt,
+    image_prompts,
+    output_dir="output/text",
+    write_json=False,
+    timestamp=None,
 ):
     """
     Save the story and image prompts to a file.
@@ -245,19 +1115,41 @@ def save_story_with_image_prompts(
     Args:
         story (str): The generated story
         prompt (str): The original prompt
-        image_prompts (list): List of image prompts
+        image_prompts (iterable): Image prompts, e.g. a list from
+            extract_image_prompts or the generator from iter_image_prompts
         output_dir (str): Directory to save the file in
+        write_json (bool): Also write the same data to a .json file alongside
+            the text file, for tools that read it back
+        timestamp (str): Timestamp for the file name, so a batch can share
+            one; defaults to the current time
     """
     os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = os.path.join(output_dir, f"story_{timestamp}.txt")
+    if timestamp is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # The suffix keeps stories saved within the same second apart
+    file_path = os.path.join(
+        output_dir, f"story_{timestamp}_{uuid.uuid4().hex[:6]}.txt"
+    )
+
+    # Consume a generator once; the text and JSON files both need the prompts
+    image_prompts = list(image_prompts)
 
+    parts = [f"Prompt: {prompt}\n\n", f"Story:\n{story}\n\n", "Image Prompts:\n"]
+    parts.extend(
+        f"{idx}: {image_prompt}\n"
+        for idx, image_prompt in enumerate(image_prompts, start=1)
+    )
     with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"Prompt: {prompt}\n\n")
-        f.write(f"Story:\n{story}\n\n")
-        f.write("Image Prompts:\n")
-        for idx, image_prompt in enumerate(image_prompts, start=1):
-            f.write(f"{idx}: {image_prompt}\n")
+        f.write("".join(parts))
+
+    if write_json:
+        record = {"prompt": prompt, "story": story, "image_prompts": image_prompts}
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(record, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(record, indent=2, ensure_ascii=False).encode("utf-8")
+        with open(os.path.splitext(file_path)[0] + ".json", "wb") as f:
+            f.write(data)
 
     logging.info(f"Story and image prompts saved to: {file_path}")
     return file_path
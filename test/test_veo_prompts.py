@@ -2,11 +2,30 @@ import os
 import random
 import sys
 import unittest
+from types import MappingProxyType
 
 # Add the parent directory to the path so we can import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+# Scene fields shared by every mock scene
+_SCENE_STYLE = MappingProxyType(
+    {
+        "camera": "slow dolly-in",
+        "lighting": "warm natural light",
+        "style": "cinematic 4K",
+    }
+)
+
+_VEO_TEMPLATE = (
+    "A cinematic 8-second shot of {scene_description}.\n"
+    "Camera: {camera}, 35mm lens, f/2.8 bokeh.\n"
+    "Lighting: {lighting}.\n"
+    "Audio: ambient sounds that match the scene.\n"
+    "Style: {style}, 24fps, natural color grading."
+)
+
+
 # Mock the enhance_story_for_video_scenes function since we can't call the real one in tests
 def mock_enhance_story_for_video_scenes(story, num_scenes=5):
     """Mock implementation of enhance_story_for_video_scenes for testing."""
@@ -23,23 +42,14 @@ def mock_enhance_story_for_video_scenes(story, num_scenes=5):
         else:
             dialogue = ""
 
-        raw_scene = {
+        raw_scene = _SCENE_STYLE | {
             "scene_description": f"Test scene {i+1} from: {story[:20]}...",
-            "camera": "slow dolly-in",
-            "lighting": "warm natural light",
             "dialogue": dialogue,
-            "style": "cinematic 4K",
         }
 
-        veo_prompt = f"""
-        A cinematic 8-second shot of {raw_scene['scene_description']}.
-        Camera: {raw_scene['camera']}, 35mm lens, f/2.8 bokeh.
-        Lighting: {raw_scene['lighting']}.
-        Audio: ambient sounds that match the scene.
-        Style: {raw_scene['style']}, 24fps, natural color grading.
-        """
-
-        scenes.append({"raw_scene": raw_scene, "veo_prompt": veo_prompt.strip()})
+        scenes.append(
+            {"raw_scene": raw_scene, "veo_prompt": _VEO_TEMPLATE.format_map(raw_scene)}
+        )
 
     return scenes
 
@@ -61,14 +71,14 @@ class TestVeoPrompts(unittest.TestCase):
             dialogue = raw_scene.get("dialogue", "")
 
             if dialogue and "exceeds limits" not in dialogue:
-                # Count words in dialogue
-                word_count = len(dialogue.split())
+                # Count words in dialogue, stopping once past the limit
+                word_count = len(dialogue.split(maxsplit=7))
 
                 # Assert dialogue is 7 words or fewer
                 self.assertLessEqual(
                     word_count,
                     7,
-                    f"Scene {i+1} dialogue has {word_count} words, which exceeds the 7-word limit: '{dialogue}'",
+                    f"Scene {i+1} dialogue exceeds the 7-word limit: '{dialogue}'",
                 )
 
                 # Check dialogue isn't too long in characters
@@ -1,116 +1,120 @@
+import functools
+import io
 import os
 import sys
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from dotenv import load_dotenv
 
 # Add current directory to path to import voiceover_generator
 sys.path.insert(0, ".")
 
-# Try to import our voiceover functions with error handling
-try:
-    from voiceover_generator import (
-        ElevenLabsAPIError,
-        ElevenLabsQuotaError,
-        VoiceoverError,
-        generate_elevenlabs_tts,
-        generate_google_tts,
-        generate_voiceover,
-    )
-
-    VOICEOVER_AVAILABLE = True
-except ImportError as e:
-    print(f"⚠️ Voiceover generator import failed: {e}")
-    print(
-        "💡 This might be due to missing dependencies (elevenlabs, google-cloud-texttospeech)"
-    )
-    VOICEOVER_AVAILABLE = False
+# Read the environment once, including .env (voiceover_generator used to load
+# it as a side effect of being imported)
+load_dotenv()
+IS_CI = bool(
+    os.getenv("CI")
+    or os.getenv("GITHUB_ACTIONS")
+    or os.getenv("CONTINUOUS_INTEGRATION")
+)
+HAS_ELEVENLABS_KEY = bool(os.getenv("ELEVENLABS_API_KEY"))
+ELEVENLABS_SUBSCRIPTION_URL = "https://api.elevenlabs.io/v1/user/subscription"
+# GOOGLE_CLOUD_CREDENTIALS is a common CI variable name
+HAS_GOOGLE_CREDS = bool(
+    os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or os.getenv("GOOGLE_CLOUD_CREDENTIALS")
+)
+
+
+def _nonempty(path):
+    """Return True if path is a file with content, using a single stat call."""
+    try:
+        return os.stat(path).st_size > 0
+    except OSError:
+        return False
 
 
-def test_elevenlabs():
-    """Test ElevenLabs TTS API connectivity."""
-    if not VOICEOVER_AVAILABLE:
-        print("⚠️ Voiceover generator not available, skipping ElevenLabs test")
-        return "skipped"
+@functools.lru_cache(maxsize=1)
+def load_voiceover():
+    """
+    Import voiceover_generator on first use, or return None if unavailable.
 
+    It pulls in the ElevenLabs and Google Cloud TTS clients, so tests that
+    don't need it (e.g. test_youtube) skip that import cost.
+    """
     try:
-        if not os.getenv("ELEVENLABS_API_KEY"):
-            print("⚠️ ELEVENLABS_API_KEY not set, skipping ElevenLabs test")
-            return "skipped"
+        import voiceover_generator
+    except ImportError as e:
+        print(f"⚠️ Voiceover generator import failed: {e}")
+        print(
+            "💡 This might be due to missing dependencies (elevenlabs, google-cloud-texttospeech)"
+        )
+        return None
+    return voiceover_generator
 
-        # Use a short test to minimize quota usage
-        test_text = "Test."
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-            output_path = tmp_file.name
-
-        try:
-            result_path = generate_elevenlabs_tts(test_text, output_path)
-            if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
-                print("✅ ElevenLabs API test passed")
-                return True
-            else:
-                print("❌ ElevenLabs API test failed: No audio generated")
-                return False
-        finally:
-            # Clean up test file
-            if os.path.exists(output_path):
-                os.unlink(output_path)
 
-    except NameError:
-        print("⚠️ ElevenLabs functions not available, skipping test")
+def test_elevenlabs():
+    """
+    Test ElevenLabs API connectivity and quota.
+
+    Queries the subscription endpoint rather than synthesizing speech, so the
+    check is fast and doesn't use up character quota.
+    """
+    if not HAS_ELEVENLABS_KEY:
+        print("⚠️ ELEVENLABS_API_KEY not set, skipping ElevenLabs test")
         return "skipped"
-    except Exception as e:
-        if "ElevenLabsQuotaError" in str(type(e)):
-            print(f"⚠️ ElevenLabs quota exceeded: {str(e)}")
+
+    try:
+        response = requests.get(
+            ELEVENLABS_SUBSCRIPTION_URL,
+            headers={"xi-api-key": os.getenv("ELEVENLABS_API_KEY")},
+            timeout=5,
+        )
+        if response.status_code != 200:
+            print(
+                f"❌ ElevenLabs API error: {response.status_code} - {response.text[:200]}"
+            )
+            return False
+
+        subscription = response.json()
+        used = subscription.get("character_count", 0)
+        limit = subscription.get("character_limit", 0)
+        if limit and used >= limit:
+            print(f"⚠️ ElevenLabs quota exceeded: {used}/{limit} characters used")
             print("💡 This is expected - fallback to Google TTS will be used")
             return "quota_exceeded"
-        elif "ElevenLabsAPIError" in str(type(e)):
-            print(f"❌ ElevenLabs API error: {str(e)}")
-            return False
-        else:
-            print(f"❌ ElevenLabs API test failed: {str(e)}")
-            return False
 
+        print(f"✅ ElevenLabs API test passed ({used}/{limit} characters used)")
+        return True
 
-def test_google_tts():
-    """Test Google Cloud TTS API connectivity."""
-    if not VOICEOVER_AVAILABLE:
-        print("⚠️ Voiceover generator not available, skipping Google TTS test")
-        return "skipped"
+    except (requests.RequestException, ValueError) as e:
+        print(f"❌ ElevenLabs API test failed: {str(e)}")
+        return False
 
-    # Check if we're in a CI environment
-    is_ci = (
-        os.getenv("CI")
-        or os.getenv("GITHUB_ACTIONS")
-        or os.getenv("CONTINUOUS_INTEGRATION")
-    )
 
-    # Check for Google Cloud credentials environment variable
-    google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-    google_creds_json = os.getenv("GOOGLE_CLOUD_CREDENTIALS")  # Common CI variable name
+def check_google_tts(output_path):
+    """Test Google Cloud TTS API connectivity, writing audio to output_path."""
+    voiceover = load_voiceover()
+    if voiceover is None:
+        print("⚠️ Voiceover generator not available, skipping Google TTS test")
+        return "skipped"
 
-    if is_ci and (google_creds or google_creds_json):
+    if IS_CI and HAS_GOOGLE_CREDS:
         print("✅ Google Cloud TTS credentials configured for CI")
         return "ci_configured"
 
     try:
         # Test with minimal text to keep costs low
         test_text = "Test."
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-            output_path = tmp_file.name
-
-        try:
-            result_path = generate_google_tts(test_text, output_path)
-            if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
-                print("✅ Google Cloud TTS API test passed")
-                return True
-            else:
-                print("❌ Google Cloud TTS test failed: No audio generated")
-                return False
-        finally:
-            # Clean up test file
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+        result_path = voiceover.generate_google_tts(test_text, output_path)
+        if _nonempty(result_path):
+            print("✅ Google Cloud TTS API test passed")
+            return True
+        else:
+            print("❌ Google Cloud TTS test failed: No audio generated")
+            return False
 
     except NameError:
         print("⚠️ Google TTS functions not available, skipping test")
@@ -118,7 +122,7 @@ def test_google_tts():
     except Exception as e:
         error_msg = str(e)
         if "default credentials were not found" in error_msg.lower():
-            if is_ci:
+            if IS_CI:
                 print(
                     "⚠️ Google Cloud TTS: Credentials not found in CI (this may be expected)"
                 )
@@ -135,29 +139,22 @@ def test_google_tts():
             return False
 
 
-def test_tts_fallback():
-    """Test the complete TTS fallback mechanism."""
-    if not VOICEOVER_AVAILABLE:
+def check_tts_fallback(output_path):
+    """Test the complete TTS fallback mechanism, writing audio to output_path."""
+    voiceover = load_voiceover()
+    if voiceover is None:
         print("⚠️ Voiceover generator not available, skipping fallback test")
         return "skipped"
 
     try:
         test_text = "Fallback test."
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-            output_path = tmp_file.name
-
-        try:
-            result_path = generate_voiceover(test_text, output_path)
-            if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
-                print("✅ TTS fallback mechanism test passed")
-                return True
-            else:
-                print("❌ TTS fallback mechanism failed: No audio generated")
-                return False
-        finally:
-            # Clean up test file
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+        result_path = voiceover.generate_voiceover(test_text, output_path)
+        if _nonempty(result_path):
+            print("✅ TTS fallback mechanism test passed")
+            return True
+        else:
+            print("❌ TTS fallback mechanism failed: No audio generated")
+            return False
 
     except NameError:
         print("⚠️ TTS fallback functions not available, skipping test")
@@ -171,6 +168,17 @@ def test_tts_fallback():
             return False
 
 
+def test_openai():
+    """Test OpenAI API connectivity."""
+    if not os.getenv("OPENAI_API_KEY"):
+        print("⚠️ OPENAI_API_KEY not set, skipping OpenAI test")
+        return "skipped"
+
+    from test_openai_connectivity import test_openai_connectivity
+
+    return test_openai_connectivity()
+
+
 def test_youtube():
     """Test YouTube API credentials."""
     try:
@@ -190,30 +198,101 @@ def test_youtube():
         return False
 
 
+class _ThreadStdout:
+    """sys.stdout stand-in giving each worker thread its own output buffer."""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "buffer", self.default)
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        # isatty(), encoding, fileno(), buffer etc. come from the real stream
+        return getattr(self.default, name)
+
+
+def run_tests_concurrently(tests):
+    """
+    Run independent connectivity tests in parallel.
+
+    Each test's output is buffered and printed in the order given, so the
+    log reads the same as a sequential run.
+
+    Args:
+        tests (list): (description, test function) pairs
+
+    Returns:
+        list: Each test's result, in the order given
+    """
+    stdout = _ThreadStdout(sys.stdout)
+
+    def run(test):
+        stdout.local.buffer = io.StringIO()
+        return test(), stdout.local.buffer.getvalue()
+
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            outcomes = list(executor.map(run, [test for _, test in tests]))
+    finally:
+        sys.stdout = stdout.default
+
+    results = []
+    for index, ((description, _), (result, output)) in enumerate(zip(tests, outcomes)):
+        if index:
+            print()
+        print(f"Testing {description}...")
+        print(output, end="")
+        results.append(result)
+    return results
+
+
 def main():
     """Run all API connectivity tests with intelligent fallback logic."""
     print("🚀 Starting API connectivity tests...")
     print("💡 Testing TTS services with fallback support\n")
 
-    if not VOICEOVER_AVAILABLE:
+    voiceover_available = load_voiceover() is not None
+    if not voiceover_available:
         print("⚠️ TTS dependencies not available in this environment")
         print(
             "💡 This is normal for CI environments without all dependencies installed"
         )
         print("✅ Assuming TTS services will work in production environment\n")
 
-    # Test individual TTS services
-    print("Testing ElevenLabs API...")
-    elevenlabs_result = test_elevenlabs()
-
-    print("\nTesting Google Cloud TTS API...")
-    google_tts_result = test_google_tts()
-
-    print("\nTesting TTS fallback mechanism...")
-    fallback_result = test_tts_fallback()
-
-    print("\nTesting YouTube API...")
-    youtube_result = test_youtube()
+    # The services are independent, so test them all at once. Test audio goes
+    # to one temporary directory, removed when the tests finish.
+    with tempfile.TemporaryDirectory() as output_dir:
+
+        def audio_test(test, name):
+            return functools.partial(test, os.path.join(output_dir, name))
+
+        (
+            elevenlabs_result,
+            google_tts_result,
+            fallback_result,
+            openai_result,
+            youtube_result,
+        ) = run_tests_concurrently(
+            [
+                ("ElevenLabs API", test_elevenlabs),
+                ("Google Cloud TTS API", audio_test(check_google_tts, "google.mp3")),
+                (
+                    "TTS fallback mechanism",
+                    audio_test(check_tts_fallback, "fallback.mp3"),
+                ),
+                ("OpenAI API", test_openai),
+                ("YouTube API", test_youtube),
+            ]
+        )
 
     # Analyze results
     print("\n📊 Test Results Summary:")
@@ -248,19 +327,20 @@ def main():
     else:
         print("  TTS Fallback: ❌ FAILED")
 
+    # OpenAI status (informational; not one of the critical services below)
+    if openai_result is True:
+        print("  OpenAI API: ✅ WORKING")
+    elif openai_result == "skipped":
+        print("  OpenAI API: ⚠️ SKIPPED")
+    else:
+        print("  OpenAI API: ❌ FAILED")
+
     # YouTube status
     print(f"  YouTube API: {'✅ WORKING' if youtube_result else '❌ FAILED'}")
 
     # Determine overall success
-    # Check if we're in CI environment
-    is_ci = (
-        os.getenv("CI")
-        or os.getenv("GITHUB_ACTIONS")
-        or os.getenv("CONTINUOUS_INTEGRATION")
-    )
-
     # If TTS dependencies aren't available, assume they'll work in production
-    if not VOICEOVER_AVAILABLE:
+    if not voiceover_available:
         tts_working = True  # Assume TTS will work in production
         print(f"\n🎯 Critical Services Status:")
         print(
@@ -268,7 +348,7 @@ def main():
         )
     else:
         # In CI: Consider TTS working if Google Cloud is configured OR ElevenLabs quota exceeded
-        if is_ci:
+        if IS_CI:
             # In CI, if Google Cloud is configured and ElevenLabs quota is exceeded, that's expected
             google_configured = google_tts_result in [True, "ci_configured"]
             elevenlabs_quota_exceeded = elevenlabs_result == "quota_exceeded"
@@ -311,17 +391,17 @@ def main():
             )
         elif elevenlabs_result == "skipped":
             print("🔄 Note: ElevenLabs not configured, using Google TTS")
-        elif not elevenlabs_result and VOICEOVER_AVAILABLE:
-            if is_ci and google_tts_result == "ci_configured":
+        elif not elevenlabs_result and voiceover_available:
+            if IS_CI and google_tts_result == "ci_configured":
                 print("🔄 Note: Running in CI with Google TTS configured")
             else:
                 print("🔄 Note: ElevenLabs failed, but Google TTS fallback is active")
         sys.exit(0)
     else:
         print("\n❌ Critical API failures detected!")
-        if not tts_working and VOICEOVER_AVAILABLE:
+        if not tts_working and voiceover_available:
             print("💥 TTS services are not working - video generation will fail")
-            if is_ci:
+            if IS_CI:
                 print(
                     "🔧 For CI: Set up GOOGLE_APPLICATION_CREDENTIALS or GOOGLE_CLOUD_CREDENTIALS"
                 )
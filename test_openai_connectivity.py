@@ -1,6 +1,6 @@
 import os
 
-import openai
+from story_generator import get_openai_client
 
 
 def test_openai_connectivity():
@@ -9,10 +9,8 @@ def test_openai_connectivity():
         print("FAIL: OPENAI_API_KEY environment variable is not set.")
         return False
     try:
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-        )
+        # The pipeline's own pooled client, so the probe tests the same setup
+        client = get_openai_client()
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -7,6 +7,7 @@ Tests both ElevenLabs and Google Cloud TTS integration.
 import os
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add current directory to path to import voiceover_generator
@@ -22,21 +23,27 @@ from voiceover_generator import (
 )
 
 
-def test_google_tts():
-    """Test Google Cloud TTS functionality."""
+def _file_size(path):
+    """Return the size of path in bytes, or 0 if it doesn't exist."""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def check_google_tts(output_path):
+    """Test Google Cloud TTS functionality, writing audio to output_path."""
     print("🧪 Testing Google Cloud Text-to-Speech...")
 
     test_text = "Hello, this is a test of Google Cloud Text-to-Speech integration."
 
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-        output_path = tmp_file.name
-
     try:
         result_path = generate_google_tts(test_text, output_path)
 
-        if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
+        file_size = _file_size(result_path)
+        if file_size > 0:
             print(f"✅ Google TTS test successful! File saved: {result_path}")
-            print(f"📊 File size: {os.path.getsize(result_path)} bytes")
+            print(f"📊 File size: {file_size} bytes")
             return True
         else:
             print("❌ Google TTS test failed: File not created or empty")
@@ -45,14 +52,10 @@ def test_google_tts():
     except Exception as e:
         print(f"❌ Google TTS test failed with error: {str(e)}")
         return False
-    finally:
-        # Clean up test file
-        if os.path.exists(output_path):
-            os.unlink(output_path)
 
 
-def test_elevenlabs_tts():
-    """Test ElevenLabs TTS functionality."""
+def check_elevenlabs_tts(output_path):
+    """Test ElevenLabs TTS functionality, writing audio to output_path."""
     print("🧪 Testing ElevenLabs Text-to-Speech...")
 
     if not os.getenv("ELEVENLABS_API_KEY"):
@@ -61,15 +64,13 @@ def test_elevenlabs_tts():
 
     test_text = "Hello, this is a test of ElevenLabs Text-to-Speech integration."
 
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-        output_path = tmp_file.name
-
     try:
         result_path = generate_elevenlabs_tts(test_text, output_path)
 
-        if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
+        file_size = _file_size(result_path)
+        if file_size > 0:
             print(f"✅ ElevenLabs TTS test successful! File saved: {result_path}")
-            print(f"📊 File size: {os.path.getsize(result_path)} bytes")
+            print(f"📊 File size: {file_size} bytes")
             return True
         else:
             print("❌ ElevenLabs TTS test failed: File not created or empty")
@@ -84,29 +85,26 @@ def test_elevenlabs_tts():
     except Exception as e:
         print(f"❌ ElevenLabs test failed with error: {str(e)}")
         return False
-    finally:
-        # Clean up test file
-        if os.path.exists(output_path):
-            os.unlink(output_path)
 
 
-def test_fallback_mechanism():
-    """Test the automatic fallback from ElevenLabs to Google TTS."""
+def check_fallback_mechanism(output_path):
+    """
+    Test the automatic fallback from ElevenLabs to Google TTS, writing audio
+    to output_path.
+    """
     print("🧪 Testing automatic fallback mechanism...")
 
     test_text = (
         "This is a test of the automatic fallback from ElevenLabs to Google Cloud TTS."
     )
 
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-        output_path = tmp_file.name
-
     try:
         result_path = generate_voiceover(test_text, output_path)
 
-        if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
+        file_size = _file_size(result_path)
+        if file_size > 0:
             print(f"✅ Fallback mechanism test successful! File saved: {result_path}")
-            print(f"📊 File size: {os.path.getsize(result_path)} bytes")
+            print(f"📊 File size: {file_size} bytes")
             return True
         else:
             print("❌ Fallback mechanism test failed: File not created or empty")
@@ -118,14 +116,24 @@ def test_fallback_mechanism():
     except Exception as e:
         print(f"❌ Fallback mechanism test failed with error: {str(e)}")
         return False
-    finally:
-        # Clean up test file
-        if os.path.exists(output_path):
-            os.unlink(output_path)
 
 
-def test_voice_options():
-    """Test different Google TTS voice options."""
+def _synthesize_voice(test_text, voice, output_path):
+    """Synthesize test_text with one Google TTS voice and return its result."""
+    try:
+        result_path = generate_google_tts(test_text, output_path, voice_name=voice)
+
+        file_size = _file_size(result_path)
+        if file_size > 0:
+            return {"success": True, "size": file_size}
+        return {"success": False, "error": "File not created or empty"}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def check_voice_options(output_dir):
+    """Test different Google TTS voice options, writing audio to output_dir."""
     print("🧪 Testing different Google TTS voices...")
 
     voices_to_test = [
@@ -135,35 +143,31 @@ def test_voice_options():
     ]
 
     test_text = "Testing different voices with Google Cloud Text-to-Speech."
-    results = {}
 
-    for voice in voices_to_test:
-        print(f"  Testing voice: {voice}")
+    # One output file per voice, so the workers don't share any
+    output_paths = [
+        os.path.join(output_dir, f"{voice}.mp3") for voice in voices_to_test
+    ]
 
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-            output_path = tmp_file.name
-
-        try:
-            result_path = generate_google_tts(test_text, output_path, voice_name=voice)
-
-            if os.path.exists(result_path) and os.path.getsize(result_path) > 0:
-                file_size = os.path.getsize(result_path)
-                results[voice] = {"success": True, "size": file_size}
-                print(f"    ✅ Voice {voice}: Success ({file_size} bytes)")
-            else:
-                results[voice] = {
-                    "success": False,
-                    "error": "File not created or empty",
-                }
-                print(f"    ❌ Voice {voice}: Failed - File not created or empty")
-
-        except Exception as e:
-            results[voice] = {"success": False, "error": str(e)}
-            print(f"    ❌ Voice {voice}: Failed - {str(e)}")
-        finally:
-            # Clean up test file
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+    # The voices are independent requests, so synthesize them all at once
+    with ThreadPoolExecutor(max_workers=len(voices_to_test)) as executor:
+        results = dict(
+            zip(
+                voices_to_test,
+                executor.map(
+                    lambda voice, path: _synthesize_voice(test_text, voice, path),
+                    voices_to_test,
+                    output_paths,
+                ),
+            )
+        )
+
+    for voice, result in results.items():
+        print(f"  Testing voice: {voice}")
+        if result["success"]:
+            print(f"    ✅ Voice {voice}: Success ({result['size']} bytes)")
+        else:
+            print(f"    ❌ Voice {voice}: Failed - {result['error']}")
 
     return results
 
@@ -172,21 +176,27 @@ def main():
     """Run all TTS tests."""
     print("🚀 Starting TTS Fallback Integration Tests\n")
 
-    # Test 1: Google Cloud TTS
-    google_result = test_google_tts()
-    print()
-
-    # Test 2: ElevenLabs TTS (if API key available)
-    elevenlabs_result = test_elevenlabs_tts()
-    print()
-
-    # Test 3: Fallback mechanism
-    fallback_result = test_fallback_mechanism()
-    print()
-
-    # Test 4: Voice options
-    voice_results = test_voice_options()
-    print()
+    # Test audio goes to one temporary directory, removed when the tests finish
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Test 1: Google Cloud TTS
+        google_result = check_google_tts(os.path.join(output_dir, "google.mp3"))
+        print()
+
+        # Test 2: ElevenLabs TTS (if API key available)
+        elevenlabs_result = check_elevenlabs_tts(
+            os.path.join(output_dir, "elevenlabs.mp3")
+        )
+        print()
+
+        # Test 3: Fallback mechanism
+        fallback_result = check_fallback_mechanism(
+            os.path.join(output_dir, "fallback.mp3")
+        )
+        print()
+
+        # Test 4: Voice options
+        voice_results = check_voice_options(output_dir)
+        print()
 
     # Summary
     print("📊 Test Summary:")
@@ -0,0 +1,350 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIStatusError, RateLimitError
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import story_generator
+from story_generator import MalformedResponseError
+
+
+class FakeClock:
+    """Stand-in for the time module that advances only when slept."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeStream:
+    """Streamed chat completion yielding one chunk per (delay, text) pair."""
+
+    def __init__(self, clock, chunks, finish_reason="stop"):
+        self.clock = clock
+        self.chunks = chunks
+        self.finish_reason = finish_reason
+        self.closed = False
+
+    def __iter__(self):
+        for index, (delay, text) in enumerate(self.chunks):
+            self.clock.now += delay
+            last = index == len(self.chunks) - 1
+            delta = SimpleNamespace(content=text)
+            choice = SimpleNamespace(
+                delta=delta, finish_reason=self.finish_reason if last else None
+            )
+            yield SimpleNamespace(choices=[choice])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """OpenAI client stub returning queued responses or raising queued errors."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def completion(content, finish_reason="stop"):
+    """Return a non-streamed chat completion with the given content."""
+    return story_generator._completion_response(content, finish_reason)
+
+
+def api_error(error_cls, status_code):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return error_cls(f"HTTP {status_code}", response=response, body=None)
+
+
+@pytest.fixture
+def llm_cache(tmp_path, monkeypatch):
+    """Point the completion cache at a temporary directory."""
+    cache_dir = str(tmp_path / "llm_cache")
+    monkeypatch.setattr(story_generator, "LLM_CACHE_DIR", cache_dir)
+    monkeypatch.delenv("STORY_CACHE_DISABLE", raising=False)
+    story_generator._read_cached_completion.cache_clear()
+    yield cache_dir
+    story_generator._read_cached_completion.cache_clear()
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Install a stub client and skip backoff delays and main's monitoring."""
+
+    def install(*responses):
+        client = FakeClient(*responses)
+        monkeypatch.setattr(story_generator, "get_openai_client", lambda: client)
+        return client
+
+    monkeypatch.setattr(story_generator, "BACKOFF_BASE", 0)
+    monkeypatch.setattr(story_generator, "_api_call_logger", lambda *args: None)
+    return install
+
+
+def test_token_bucket_paces_requests(monkeypatch):
+    """Requests beyond the bucket's capacity wait for it to refill."""
+    clock = FakeClock()
+    monkeypatch.setattr(story_generator, "time", clock)
+    bucket = story_generator._TokenBucket(rate=2, capacity=2)
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_token_bucket_throttle_halves_rate(monkeypatch):
+    """After a rate-limit response the bucket refills at half speed."""
+    clock = FakeClock()
+    monkeypatch.setattr(story_generator, "time", clock)
+    bucket = story_generator._TokenBucket(rate=2, capacity=1)
+
+    bucket.acquire()
+    bucket.throttle()
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    # Back to the full rate once the cooldown has passed
+    clock.now += story_generator.RATE_LIMIT_COOLDOWN
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps[-1] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize(
+    "name, value, default, minimum",
+    [("OPENAI_TPS", "0", 5.0, 0.1), ("OPENAI_MAX_INFLIGHT", "-2", 5, 1)],
+)
+def test_rate_limit_settings_are_clamped(monkeypatch, name, value, default, minimum):
+    """Non-positive limits would stall or divide by zero, so they are raised."""
+    monkeypatch.setenv(name, value)
+
+    assert story_generator._positive_setting(name, default, minimum) == minimum
+
+
+def test_streamed_response_holds_inflight_slot_until_closed(monkeypatch):
+    """A streamed request counts against OPENAI_MAX_INFLIGHT until closed."""
+    monkeypatch.setattr(story_generator, "_INFLIGHT", threading.Semaphore(1))
+    stream = FakeStream(FakeClock(), [(0, "story")])
+    client = FakeClient(stream)
+
+    response = story_generator._create_chat_completion(client, {"stream": True})
+    assert not story_generator._INFLIGHT.acquire(blocking=False)
+
+    response.close()
+    assert stream.closed
+    assert story_generator._INFLIGHT.acquire(blocking=False)
+
+
+def test_collect_stream_joins_chunks():
+    stream = FakeStream(FakeClock(), [(0, "Once "), (1, "upon "), (1, "a time")])
+
+    response = story_generator._collect_stream(stream, idle_timeout=5)
+
+    assert response.choices[0].message.content == "Once upon a time"
+    assert response.choices[0].finish_reason == "stop"
+    assert stream.closed
+
+
+def test_collect_stream_idle_timeout(monkeypatch):
+    """A gap between chunks longer than the idle timeout aborts the stream."""
+    clock = FakeClock()
+    monkeypatch.setattr(story_generator, "time", clock)
+    stream = FakeStream(clock, [(0, "Once "), (30, "upon")])
+
+    with pytest.raises(TimeoutError):
+        story_generator._collect_stream(stream, idle_timeout=20)
+    assert stream.closed
+
+
+def test_completion_cache_hit_and_miss(llm_cache):
+    with pytest.raises(KeyError):
+        story_generator._cached_completion("missing")
+
+    story_generator._save_completion("key", "cached story")
+    assert story_generator._cached_completion("key") == "cached story"
+
+
+def test_completion_cache_expiry(llm_cache):
+    """Entries older than LLM_CACHE_TTL are treated as misses."""
+    story_generator._save_completion("key", "cached story")
+    expired = time.time() - story_generator.LLM_CACHE_TTL - 60
+    os.utime(os.path.join(llm_cache, "key.json"), (expired, expired))
+    story_generator._read_cached_completion.cache_clear()
+
+    with pytest.raises(KeyError):
+        story_generator._cached_completion("key")
+
+
+def test_completion_cache_evicts_oldest(llm_cache, monkeypatch):
+    monkeypatch.setattr(story_generator, "LLM_CACHE_MAX_ENTRIES", 2)
+    now = time.time()
+    for age, key in enumerate(["new", "old"]):
+        story_generator._save_completion(key, key)
+        os.utime(os.path.join(llm_cache, f"{key}.json"), (now - age, now - age))
+
+    story_generator._save_completion("newest", "newest")
+
+    assert sorted(os.listdir(llm_cache)) == ["new.json", "newest.json"]
+
+
+def test_is_cacheable():
+    assert story_generator._is_cacheable({"temperature": 0.2})
+    assert story_generator._is_cacheable({"temperature": 0.7, "seed": 1})
+    assert not story_generator._is_cacheable({"temperature": 0.7})
+    assert not story_generator._is_cacheable({"temperature": 0, "stream": True})
+
+
+def test_call_openai_with_backoff_serves_repeat_from_cache(llm_cache, fake_api):
+    client = fake_api(completion("first"))
+    request = dict(model="gpt-4o-mini", messages=[], temperature=0)
+
+    first = story_generator.call_openai_with_backoff(**request)
+    second = story_generator.call_openai_with_backoff(**request)
+
+    assert first.choices[0].message.content == "first"
+    assert second.choices[0].message.content == "first"
+    assert len(client.requests) == 1
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (api_error(RateLimitError, 429), True),
+        (api_error(APIStatusError, 503), True),
+        (api_error(APIStatusError, 400), False),
+        (httpx.ConnectError("connection refused"), True),
+        (TimeoutError("stream stalled"), True),
+        (MalformedResponseError("not JSON"), True),
+        (ValueError("OPENAI_API_KEY environment variable is not set"), False),
+    ],
+)
+def test_is_retryable(error, retryable):
+    assert story_generator._is_retryable(error) is retryable
+
+
+def test_non_retryable_error_is_raised_immediately(fake_api):
+    client = fake_api(api_error(APIStatusError, 400))
+
+    with pytest.raises(APIStatusError):
+        story_generator.call_openai_with_backoff(model="m", messages=[])
+    assert len(client.requests) == 1
+
+
+def test_retries_exhausted_keep_original_error(fake_api):
+    client = fake_api(*[completion("not JSON")] * 3)
+
+    with pytest.raises(Exception) as excinfo:
+        story_generator.call_openai_with_backoff(
+            model="m",
+            messages=[],
+            validate=story_generator._parse_image_prompts,
+        )
+    assert isinstance(excinfo.value.__cause__, MalformedResponseError)
+    assert len(client.requests) == 3
+
+
+def test_truncated_response_is_retried_with_larger_budget(fake_api):
+    client = fake_api(
+        completion('{"prompts": ["A misty cas', finish_reason="length"),
+        completion('{"prompts": ["A misty castle at dawn"]}'),
+    )
+
+    response = story_generator.call_openai_with_backoff(
+        model="m",
+        messages=[],
+        max_tokens=100,
+        validate=story_generator._parse_image_prompts,
+    )
+
+    assert response.choices[0].message.content.endswith('dawn"]}')
+    assert [r["max_tokens"] for r in client.requests] == [100, 200]
+
+
+def test_parse_story_and_prompts():
+    content = '{"story": " Once upon a time ", "image_prompts": [" A castle ", 3]}'
+
+    story, image_prompts = story_generator._parse_story_and_prompts(content)
+
+    assert story == "Once upon a time"
+    assert image_prompts == ["A castle"]
+
+
+@pytest.mark.parametrize(
+    "content", ['{"story": "Once upon', '{"image_prompts": []}', '{"story": " "}']
+)
+def test_parse_story_and_prompts_malformed(content):
+    with pytest.raises(MalformedResponseError):
+        story_generator._parse_story_and_prompts(content)
+
+
+def test_parse_image_prompts():
+    content = '{"prompts": [" A misty castle at dawn ", "x", 3, "A red fox in snow"]}'
+
+    assert story_generator._parse_image_prompts(content) == [
+        "A misty castle at dawn",
+        "A red fox in snow",
+    ]
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["1. A misty castle at dawn", '{"scenes": []}', '{"prompts": "one"}', "null"],
+)
+def test_parse_image_prompts_malformed(content):
+    with pytest.raises(MalformedResponseError):
+        story_generator._parse_image_prompts(content)
+
+
+@pytest.mark.skipif(
+    not story_generator.NUMPY_AVAILABLE, reason="numpy is not installed"
+)
+def test_semantic_cache_threshold(tmp_path):
+    np = story_generator.np
+    cache = story_generator._SemanticCache(str(tmp_path))
+    cache.store("ns", np.array([1.0, 0.0], dtype=np.float32), "stored story")
+
+    def unit(x, y):
+        vector = np.array([x, y], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    # cos(a) = 0.97 is above SEMANTIC_CACHE_THRESHOLD, 0.8 is below it
+    assert cache.lookup("ns", unit(0.97, 0.243)) == "stored story"
+    assert cache.lookup("ns", unit(0.8, 0.6)) is None
+    assert cache.lookup("other", unit(1.0, 0.0)) is None
+
+    # A fresh instance reads the index back from disk
+    reloaded = story_generator._SemanticCache(str(tmp_path))
+    assert reloaded.lookup("ns", unit(1.0, 0.0)) == "stored story"
@@ -5,7 +5,8 @@ import random
 from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from story_generator import get_openai_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -32,15 +33,8 @@ class TopicManager:
         """Lazy initialization of OpenAI client."""
         if self._client is None:
             try:
-                api_key = os.getenv("OPENAI_API_KEY")
-                if not api_key:
-                    raise ValueError("OPENAI_API_KEY environment variable is not set")
-                logger.info("Initializing OpenAI client")
-                self._client = OpenAI(
-                    api_key=api_key,
-                    base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-                )
-                logger.info("OpenAI client initialized successfully")
+                # Share the process-wide client and its connection pool
+                self._client = get_openai_client()
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI client: {str(e)}")
                 raise
@@ -5,6 +5,7 @@ import random
 import subprocess
 import textwrap
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -46,6 +47,9 @@ logger = logging.getLogger(__name__)
 MAX_RETRIES = 3
 MAX_BACKOFF = 120  # Max backoff in seconds
 
+# Scene clips generated at once by generate_scene_videos, bounded by Veo quota
+VEO_MAX_CONCURRENT_CLIPS = int(os.environ.get("VEO_MAX_CONCURRENT_CLIPS", 2))
+
 
 def create_video(images, voiceover_path, story, timestamp, output_path):
     """
@@ -491,16 +495,18 @@ def generate_scene_videos(scenes: List[Dict[str, str]], output_dir: str) -> List
     """
     Generate videos for each scene using Veo.
 
+    Up to VEO_MAX_CONCURRENT_CLIPS scenes are generated at once, so their
+    long-running operations are waited on together rather than one by one.
+
     Args:
         scenes (List[Dict[str, str]]): List of scene dictionaries with prompts
         output_dir (str): Directory to save the videos
 
     Returns:
-        List[str]: List of paths to the generated videos
+        List[str]: List of paths to the generated videos, in scene order
     """
-    video_paths = []
 
-    for i, scene in enumerate(scenes):
+    def generate(i, scene):
         logger.info(f"Generating video for scene {i+1}/{len(scenes)}")
         try:
             video_path = make_veo_clip(
@@ -509,13 +515,22 @@ def generate_scene_videos(scenes: List[Dict[str, str]], output_dir: str) -> List
                 aspect="16:9",
                 output_dir=output_dir,
             )
-            video_paths.append(video_path)
             logger.info(f"Scene {i+1} video generated: {video_path}")
+            return video_path
         except Exception as e:
             logger.error(f"Error generating video for scene {i+1}: {str(e)}")
             # Continue with remaining scenes
+            return None
+
+    if not scenes:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=min(VEO_MAX_CONCURRENT_CLIPS, len(scenes))
+    ) as executor:
+        results = list(executor.map(generate, range(len(scenes)), scenes))
 
-    return video_paths
+    return [video_path for video_path in results if video_path]
 
 
 def ffmpeg_concat(
@@ -1,5 +1,7 @@
+import functools
 import logging
 import os
+import threading
 import time
 from typing import Optional
 
@@ -13,6 +15,26 @@ load_dotenv()
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Reused for every ElevenLabs request, so retries and later voiceovers skip
+# the TCP/TLS handshake
+_ELEVENLABS_SESSION = requests.Session()
+
+# Guards the first construction of the shared TextToSpeechClient
+_TTS_CLIENT_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _build_tts_client():
+    client = texttospeech.TextToSpeechClient()
+    logger.info("✅ TextToSpeechClient created successfully")
+    return client
+
+
+def get_tts_client():
+    """Get or create the shared Google Cloud TextToSpeechClient."""
+    with _TTS_CLIENT_LOCK:
+        return _build_tts_client()
+
 
 class VoiceoverError(Exception):
     """Base exception for voiceover generation errors"""
@@ -77,11 +99,8 @@ def generate_google_tts(
                     "⚠️ GOOGLE_APPLICATION_CREDENTIALS environment variable not set"
                 )
 
-        # Create the Text-to-Speech client
-        client = texttospeech.TextToSpeechClient()
-
-        # Log successful client creation
-        logger.info("✅ TextToSpeechClient created successfully")
+        # Get the shared Text-to-Speech client
+        client = get_tts_client()
 
         # Set the text input to be synthesized
         synthesis_input = texttospeech.SynthesisInput(text=text)
@@ -180,7 +199,7 @@ def generate_elevenlabs_tts(text: str, output_path: str) -> str:
     while retry_count < max_retries:
         try:
             logger.info("🔄 Generating voiceover using ElevenLabs...")
-            response = requests.post(
+            response = _ELEVENLABS_SESSION.post(
                 "https://api.elevenlabs.io/v1/text-to-speech/AZnzlk1XvdvUeBnXmlld",
                 headers=headers,
                 json=data,